@@ -1,13 +1,19 @@
-from flask import Flask, jsonify
+import os
+import time
+
+from flask import Flask, jsonify, request, g
 from flask_cors import CORS
 
 from auth.controllers import AuthManager
 from auth.exceptions import AuthError, CSRFError, InvalidCredentials, UserAlreadyExists, OAuthError
 from auth.services.auth_service import AuthService
+from services.exceptions import LLMUnavailableError
 from routes.candidates import bp as candidate_bp
 from routes.comparison import bp as comparison_bp
 from routes.export import bp as export_bp
 from routes.auth import bp as auth_bp
+from routes.metrics import bp as metrics_bp
+from utils.metrics import HTTP_REQUEST_DURATION, REGISTRY
 from app_config import settings
 
 
@@ -23,6 +29,21 @@ def create_app():
     app.register_blueprint(comparison_bp)
     app.register_blueprint(export_bp)
     app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(metrics_bp)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_duration(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            # Endpoint rather than path, so /export/json/<id> stays one series
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started,
+                                          endpoint=request.endpoint or "unmatched",
+                                          method=request.method, status=response.status_code)
+        return response
 
     @app.errorhandler(AuthError)
     def handle_auth_error(e):
@@ -44,10 +65,21 @@ def create_app():
     def handle_oauth_error(e):
         return jsonify({"error": str(e)}), 400
 
+    @app.errorhandler(LLMUnavailableError)
+    def handle_llm_unavailable(e):
+        response = jsonify({"error": "AI service is temporarily unavailable, please retry shortly"})
+        if e.retry_after:
+            response.headers["Retry-After"] = str(int(e.retry_after + 0.999))
+        return response, 503
+
     return app
 
 
 if __name__ == '__main__':
+    # The reloader's child runs this again; only the parent starts from a clean slate
+    if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        REGISTRY.clear()
+
     app = create_app()
 
     print(f"HR Tool is running on http://0.0.0.0:5000")
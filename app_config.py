@@ -12,6 +12,79 @@ class Settings(BaseSettings):
     DEBUG: bool
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT_SECONDS: float = 5.0
+    REDIS_CONNECT_TIMEOUT_SECONDS: float = 1.0
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS: int = 30
+    REDIS_RETRY_SECONDS: int = 30
+    EVALUATION_STORE_TTL_SECONDS: int = 24*3600
+    REHYDRATED_SESSION_TTL_SECONDS: int = 3600
+    EVALUATION_STORE_HASHES: bool = True
+    EVALUATION_STORE_SERIALIZER: str = "json"
+    EVALUATION_STORE_COMPRESSION: str = "zlib"
+    EVALUATION_STORE_COMPRESS_MIN_BYTES: int = 1024
+    EVALUATION_STORE_COMPRESSION_LEVEL: int = 6
+    FALLBACK_STORE_BACKEND: str = "sqlite"
+    FALLBACK_STORE_PATH: str = ""
+    FALLBACK_STORE_MAX_BYTES: int = 64*1024*1024
+    FALLBACK_STORE_SWEEP_INTERVAL_SECONDS: float = 30.0
+    SESSION_L1_CACHE_ENABLED: bool = False
+    SESSION_L1_CACHE_MAX_ENTRIES: int = 1000
+    SESSION_L1_CACHE_TTL_SECONDS: float = 5.0
+    OPENAI_MAX_CONNECTIONS: int = 20
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    OPENAI_TIMEOUT_SECONDS: float = 120.0
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    OPENAI_MAX_RETRIES: int = 0
+    LLM_RETRY_MAX_ATTEMPTS: int = 3
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 1.0
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 20.0
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    LLM_RATE_LIMIT_MAX_WAIT_SECONDS: float = 10.0
+    LLM_RATE_LIMITS: dict[str, dict[str, int]] = {
+        "gpt-4": {"rpm": 500, "tpm": 30000},
+        "gpt-3.5-turbo": {"rpm": 3500, "tpm": 200000}
+    }
+    LLM_BACKEND: str = "openai"
+    LLM_CASSETTE_PATH: str = "./cassettes/llm_cassette.jsonl"
+    LLM_REPLAY_LATENCY: bool = False
+    LLM_FAKE_LATENCY_DISTRIBUTION: str = "lognormal"
+    LLM_FAKE_LATENCY_MEAN_MS: float = 800.0
+    LLM_FAKE_LATENCY_STDDEV_MS: float = 300.0
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_USE_REDIS: bool = True
+    LLM_CACHE_MAX_BYTES: int = 32*1024*1024
+    LLM_CACHE_TTL_SECONDS: int = 7*24*3600
+    CANDIDATE_PIPELINE_CONCURRENT: bool = True
+    LLM_PIPELINE_WORKERS: int = 4
+    LLM_CALL_TIMEOUT_SECONDS: int = 90
+    LLM_ASYNC_MAX_CONCURRENCY: int = 16
+    ASYNC_UPLOAD_PIPELINE: bool = False
+    BULK_UPLOAD_MAX_FILES: int = 200
+    BULK_UPLOAD_MAX_ENTRY_BYTES: int = 16*1024*1024
+    BULK_UPLOAD_CONCURRENCY: int = 8
+    PDF_MAX_PAGES: int = 50
+    PDF_MAX_CHARS: int = 200_000
+    PDF_EXTRACT_TIMEOUT_SECONDS: float = 20.0
+    PDF_PROCESS_POOL_WORKERS: int = 0
+    PDF_PARALLEL_MIN_PAGES: int = 16
+    PERSIST_UPLOADS: bool = True
+    PERSIST_UPLOADS_ASYNC: bool = True
+    UPLOAD_RETENTION_DAYS: int = 90
+    UPLOAD_QUOTA_BYTES: int = 5*1024*1024*1024
+    UPLOAD_EVICTION_INTERVAL_SECONDS: int = 3600
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_DIR: str = ""
+    EXTRACTION_CACHE_MAX_BYTES: int = 256*1024*1024
+    EXTRACTION_CACHE_USE_REDIS: bool = True
+    EXTRACTION_CACHE_TTL_SECONDS: int = 30*24*3600
+    METRICS_ENABLED: bool = True
+    METRICS_DIR: str = "/tmp/hr_tool_metrics"
+    METRICS_FLUSH_INTERVAL_SECONDS: float = 5.0
     RABBITMQ_USER: str
     RABBITMQ_PASS: str
     RABBITMQ_VHOST: str
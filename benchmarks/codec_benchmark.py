@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+EvaluationStore codec benchmark.
+
+Builds candidate and comparison sessions the way the managers do, with analysis,
+quiz, evaluation and comparison produced by the fake LLM backend, then reports for
+every codec setting the bytes stored per session (whole-record and hash layouts)
+and the CPU time to encode and decode one session.
+
+    python -m benchmarks.codec_benchmark --sessions 50 --cv-kb 12 --output codec.json
+
+With --redis the sessions are also written to Redis (REDIS_HOST/REDIS_PORT) and
+MEMORY USAGE is reported, which includes Redis' own per-key overhead.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARK_ENV = {
+    "LLM_BACKEND": "fake",
+    "LLM_FAKE_LATENCY_MEAN_MS": "0",
+    "LLM_FAKE_LATENCY_STDDEV_MS": "0",
+    "LLM_CACHE_ENABLED": "False",
+    "LLM_RATE_LIMIT_ENABLED": "False",
+}
+for _name, _value in BENCHMARK_ENV.items():
+    os.environ.setdefault(_name, _value)
+
+CV_SECTIONS = [
+    "Senior Salesforce Developer at {company} ({start}-{end}). Designed Apex trigger frameworks, "
+    "migrated Visualforce pages to Lightning Web Components and owned the CI pipeline with SFDX.",
+    "Built REST and Platform Event integrations between Salesforce and {company}'s ERP, "
+    "processing {volume} records per day with Queueable and Batch Apex within governor limits.",
+    "Led a team of {team} developers delivering a CPQ rollout; wrote pricing rules, "
+    "approval processes and {tests} unit tests keeping coverage above 90%.",
+    "Skills: Apex, SOQL, SOSL, LWC, Aura, Flows, Process Builder, Experience Cloud, Service Cloud, "
+    "Sales Cloud, Heroku, JavaScript, TypeScript, Git, Jenkins, Copado.",
+    "Certifications: Platform Developer I, Platform Developer II, Application Architect, JavaScript Developer I.",
+]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"]
+# Free-form bullet points, so the text doesn't compress better than a real CV
+BULLET_WORDS = (
+    "implemented refactored migrated designed automated reduced improved delivered owned reviewed "
+    "mentored integrated optimized documented tested deployed monitored estimated coordinated resolved "
+    "account opportunity case lead quote invoice contract entitlement territory forecast dashboard report "
+    "trigger handler selector service domain batch queueable scheduler platform event callout webhook "
+    "middleware mulesoft boomi sap netsuite stripe twilio docusign okta azure aws heroku postgres kafka "
+    "latency throughput coverage backlog sprint release sandbox scratch org metadata profile permission "
+    "sharing rule validation formula flow screen component modal wizard portal community partner customer "
+    "from to for with within across between per after before during while using without via onto "
+    "the a an our their new legacy critical nightly realtime bulk complex custom managed unmanaged"
+).split()
+
+
+def make_cv_text(rng, kb):
+    lines = [f"Candidate {rng.randint(1000, 9999)} - Salesforce Developer"]
+    while sum(len(line) + 1 for line in lines) < kb * 1024:
+        start = rng.randint(2008, 2020)
+        lines.append(rng.choice(CV_SECTIONS).format(
+            company=rng.choice(COMPANIES), start=start, end=start + rng.randint(1, 4),
+            volume=rng.randint(10, 900) * 1000, team=rng.randint(2, 12), tests=rng.randint(100, 2000)
+        ))
+        for _ in range(rng.randint(2, 4)):
+            words = rng.choices(BULLET_WORDS, k=rng.randint(10, 22))
+            lines.append(f"- {' '.join(words).capitalize()}, {rng.randint(5, 95)}% {rng.choice(BULLET_WORDS)}.")
+    return "\n".join(lines)
+
+
+def make_sessions(count, cv_kb, seed=7):
+    """Candidate sessions (evaluated) and comparison sessions as the managers store them"""
+    from managers.candidate_manager import CandidateManager
+    from services.cv_comparator import CVComparator
+    from services.response_evaluator import ResponseEvaluator
+
+    manager = CandidateManager()
+    evaluator = ResponseEvaluator()
+    comparator = CVComparator()
+    rng = random.Random(seed)
+    responses = {
+        "technical": {"q1": "Bulkify triggers and keep SOQL out of loops", "q2": "Queueable when chaining is needed",
+                      "q3": "Named credentials and a REST resource"},
+        "soft_skills": {"sq1": "I explained the trade-offs to the stakeholders", "sq2": "Reproduce it first"}
+    }
+
+    sessions = []
+    for _ in range(count):
+        cv_text = make_cv_text(rng, cv_kb)
+        analysis = manager.cv_analyzer.analyze_cv(cv_text)
+        quiz = manager.quiz_generator.generate_quiz(cv_text)
+        data = manager._build_candidate_data(cv_text, analysis, quiz, "/uploads/blobs/ab/abcdef.pdf")
+        data.update({
+            "evaluation": evaluator.evaluate_responses(cv_text, quiz, responses),
+            "responses": responses,
+            "evaluated_at": data["created_at"]
+        })
+        sessions.append(("candidate", data))
+
+        cv2_text = cv_text + "\n" + make_cv_text(rng, max(1, cv_kb // 4))
+        comparison = comparator.compare_cvs(cv_text, cv2_text, "LinkedIn", "Generated")
+        questions = comparator.generate_comparison_questions(comparison)
+        sessions.append(("comparison", {
+            "cv1_text": cv_text, "cv2_text": cv2_text, "cv1_name": "LinkedIn", "cv2_name": "Generated",
+            "cv1_path": "/uploads/blobs/ab/1.pdf", "cv2_path": "/uploads/blobs/cd/2.pdf",
+            "comparison_result": comparison, "questions": questions,
+            "summary": comparator.format_comparison_summary(comparison, questions),
+            "created_at": data["created_at"], "type": "comparison"
+        }))
+    return sessions
+
+
+class LegacyCodec:
+    """What EvaluationStore wrote before codecs: json.dumps with default settings"""
+    serializer = "json (legacy)"
+    compression = "none"
+
+    def encode(self, value):
+        return json.dumps(value).encode("utf-8")
+
+    def decode(self, raw):
+        return json.loads(raw)
+
+
+def codec_variants():
+    from utils.codec import Codec, _load_msgpack, _load_zstd
+    variants = [("legacy", LegacyCodec()),
+                ("json", Codec("json", "none")),
+                ("json+zlib1", Codec("json", "zlib", level=1)),
+                ("json+zlib6", Codec("json", "zlib", level=6))]
+    if _load_zstd() is not None:
+        variants.append(("json+zstd3", Codec("json", "zstd", level=3)))
+    if _load_msgpack() is not None:
+        variants.append(("msgpack", Codec("msgpack", "none")))
+        variants.append(("msgpack+zlib6", Codec("msgpack", "zlib", level=6)))
+    return variants
+
+
+def encoded_sizes(codec, data):
+    """Bytes for the whole record, and for the hash layout (field names + values)"""
+    blob = len(codec.encode(data))
+    hashed = sum(len(field.encode("utf-8")) + len(codec.encode(value)) for field, value in data.items())
+    return blob, hashed
+
+
+def cpu_per_session(codec, sessions, repeat):
+    encoded = [codec.encode(data) for _, data in sessions]
+    started = time.process_time()
+    for _ in range(repeat):
+        for _, data in sessions:
+            codec.encode(data)
+    encode_s = time.process_time() - started
+
+    started = time.process_time()
+    for _ in range(repeat):
+        for raw in encoded:
+            codec.decode(raw)
+    decode_s = time.process_time() - started
+
+    runs = repeat * len(sessions)
+    return round(encode_s / runs * 1e6, 1), round(decode_s / runs * 1e6, 1)
+
+
+def redis_memory(codec, sessions, use_hashes):
+    """Mean MEMORY USAGE per session, None when Redis isn't reachable"""
+    import redis
+    from utils.redis_client import get_redis
+    from utils.storage import EvaluationStore
+
+    store = EvaluationStore(ttl_seconds=600, use_hashes=use_hashes, codec=codec)
+    client = get_redis()
+    try:
+        client.ping()
+    except redis.exceptions.RedisError:
+        return None
+
+    keys = [f"codec_benchmark:{i}" for i in range(len(sessions))]
+    try:
+        for key, (_, data) in zip(keys, sessions):
+            store.set(key, data)
+        usage = [client.memory_usage(key, samples=0) or 0 for key in keys]
+        return round(sum(usage) / len(usage))
+    finally:
+        client.delete(*keys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50, help="candidate sessions (plus as many comparisons)")
+    parser.add_argument("--cv-kb", type=int, default=12, help="approximate extracted CV text size")
+    parser.add_argument("--repeat", type=int, default=5, help="encode/decode passes for the CPU figures")
+    parser.add_argument("--redis", action="store_true", help="also measure MEMORY USAGE in Redis")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    sessions = make_sessions(args.sessions, args.cv_kb)
+    results = []
+    for name, codec in codec_variants():
+        per_kind = {}
+        for kind in ("candidate", "comparison"):
+            subset = [item for item in sessions if item[0] == kind]
+            sizes = [encoded_sizes(codec, data) for _, data in subset]
+            encode_us, decode_us = cpu_per_session(codec, subset, args.repeat)
+            per_kind[kind] = {
+                "bytes_per_session": round(sum(blob for blob, _ in sizes) / len(sizes)),
+                "bytes_per_session_hash": round(sum(hashed for _, hashed in sizes) / len(sizes)),
+                "encode_us": encode_us,
+                "decode_us": decode_us
+            }
+            if args.redis:
+                per_kind[kind]["redis_memory_usage"] = redis_memory(codec, subset, use_hashes=False)
+                per_kind[kind]["redis_memory_usage_hash"] = redis_memory(codec, subset, use_hashes=True)
+        results.append({"codec": name, "serializer": codec.serializer, "compression": codec.compression,
+                        **per_kind})
+
+    legacy = results[0]
+    for result in results:
+        for kind in ("candidate", "comparison"):
+            result[kind]["ratio_vs_legacy"] = round(
+                result[kind]["bytes_per_session"] / legacy[kind]["bytes_per_session"], 3)
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"sessions": args.sessions, "cv_kb": args.cv_kb, "repeat": args.repeat},
+        "results": results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Benchmark report written to {args.output}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
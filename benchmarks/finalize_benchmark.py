@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+finalize_candidate_evaluation database benchmark.
+
+Writes the candidates rows of evaluated sessions built like the codec benchmark,
+first with the old SELECT + ORM insert/update path and then with
+CandidateRepository.upsert_evaluation. Every session is finalized twice, the
+second run standing in for an acks_late redelivery, and both runs are timed.
+Reports per-task wall time, time spent in SQL statements and statements per task.
+
+    python -m benchmarks.finalize_benchmark --sessions 200 --output finalize.json
+
+Needs the Postgres database from DATABASE_URL (or the test database with
+USE_TEST_DATABASE); the rows it writes are deleted afterwards.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.codec_benchmark import make_sessions
+from benchmarks.pipeline_benchmark import summarize
+
+
+class StatementTimer:
+    """SQL statements executed and the time spent in them"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements = 0
+        self.seconds = 0.0
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["benchmark_started"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        self.seconds += time.perf_counter() - conn.info.pop("benchmark_started")
+
+    def reset(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+def legacy_finalize(session_id, data):
+    """What finalize_candidate_evaluation did before the upsert, including its log line"""
+    from db.models import Candidate
+    from db.session import sync_session_factory
+
+    session = sync_session_factory()
+    try:
+        print("FINAL DATA FOR ORM:", json.dumps(data, indent=2))
+        cand = session.query(Candidate).filter_by(id=session_id).one_or_none()
+        if cand:
+            cand.first_name = data.get("first_name") or cand.first_name
+            cand.last_name = data.get("last_name") or cand.last_name
+            cand.email = data.get("email") or cand.email
+            cand.phone = data.get("phone") or cand.phone
+            cand.cv_path = data.get("file_path") or cand.cv_path
+            cand.quiz = data.get("quiz") or cand.quiz
+            cand.responses = data.get("responses") or cand.responses
+            cand.model_raw = data.get("evaluation", {}).get("raw_evaluation") or cand.model_raw
+            cand.model_recommendation = data.get("evaluation", {}).get("recommendation") or cand.model_recommendation
+            cand.evaluation_summary = json.dumps(data.get("evaluation")) or cand.evaluation_summary
+            cand.status = "completed"
+        else:
+            session.add(Candidate(
+                id=session_id,
+                first_name=data.get("first_name"),
+                last_name=data.get("last_name"),
+                email=data.get("email"),
+                phone=data.get("phone"),
+                cv_path=data.get("file_path"),
+                quiz=data.get("quiz"),
+                responses=data.get("responses"),
+                model_raw=data.get("evaluation", {}).get("raw_evaluation"),
+                model_recommendation=data.get("evaluation", {}).get("recommendation"),
+                evaluation_summary=json.dumps(data.get("evaluation")),
+                status="completed"
+            ))
+        session.commit()
+    finally:
+        session.close()
+
+
+def upsert_finalize(session_id, data):
+    from candidates.repositories.candidate_repository import CandidateRepository
+    CandidateRepository.upsert_evaluation(session_id, data)
+
+
+def run_variant(finalize, payloads, timer):
+    """Finalize every payload twice under fresh ids; returns the report and the ids written"""
+    ids = [str(uuid.uuid4()) for _ in payloads]
+    report = {}
+    for phase in ("first_run", "redelivery"):
+        samples, db_seconds, statements = [], 0.0, 0
+        # The legacy log line goes nowhere so a terminal doesn't skew the timings
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for session_id, data in zip(ids, payloads):
+                timer.reset()
+                started = time.perf_counter()
+                finalize(session_id, data)
+                samples.append(time.perf_counter() - started)
+                db_seconds += timer.seconds
+                statements += timer.statements
+        report[phase] = {
+            **summarize(samples),
+            "db_ms_per_task": round(db_seconds / len(payloads) * 1000, 3),
+            "statements_per_task": round(statements / len(payloads), 2)
+        }
+    return report, ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200, help="evaluated candidate sessions to finalize")
+    parser.add_argument("--cv-kb", type=int, default=12, help="approximate extracted CV text size")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    from celery_app.tasks import FINALIZE_FIELDS
+    from db.models import Candidate
+    from db.session import sync_engine, sync_session_factory
+
+    # SQL echo would be the dominant cost of both variants
+    sync_engine.echo = False
+    timer = StatementTimer(sync_engine)
+
+    sessions = make_sessions(args.sessions, args.cv_kb)
+    payloads = [{field: data[field] for field in FINALIZE_FIELDS if field in data}
+                for kind, data in sessions if kind == "candidate"]
+
+    results = {}
+    written = []
+    try:
+        for name, finalize in (("legacy", legacy_finalize), ("upsert", upsert_finalize)):
+            # Warm-up so connecting and statement compilation don't land in the samples
+            warmup_id = str(uuid.uuid4())
+            written.append(warmup_id)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                finalize(warmup_id, payloads[0])
+            results[name], ids = run_variant(finalize, payloads, timer)
+            written.extend(ids)
+    finally:
+        with sync_session_factory() as session:
+            session.query(Candidate).filter(Candidate.id.in_(written)).delete(synchronize_session=False)
+            session.commit()
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"sessions": len(payloads), "cv_kb": args.cv_kb},
+        "results": results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Benchmark report written to {args.output}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
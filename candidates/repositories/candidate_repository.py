@@ -0,0 +1,92 @@
+import json
+import uuid
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.models import Candidate
+from db.session import sync_session_factory
+
+
+class CandidateRepository:
+    @staticmethod
+    def upsert_evaluation(session_id: str, data: dict):
+        """
+        Insert or update the candidates row of an evaluated session in one
+        statement, so retries and concurrent runs converge on the same row.
+        On update, fields that are empty in data keep their stored value.
+        """
+        evaluation = data.get("evaluation") or {}
+        values = {
+            "first_name": data.get("first_name"),
+            "last_name": data.get("last_name"),
+            "email": data.get("email"),
+            "phone": data.get("phone"),
+            "cv_path": data.get("file_path"),
+            "quiz": data.get("quiz"),
+            "responses": data.get("responses"),
+            "model_raw": evaluation.get("raw_evaluation"),
+            "model_recommendation": evaluation.get("recommendation"),
+        }
+        stmt = insert(Candidate).values(
+            id=session_id, evaluation_summary=json.dumps(data.get("evaluation")), status="completed", **values
+        )
+        # Leaving empty fields out of the SET list is COALESCE(new, old) with the
+        # same notion of empty as Python's "or", including {} for the JSONB columns
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Candidate.id],
+            set_={
+                **{column: stmt.excluded[column] for column, value in values.items() if value},
+                "evaluation_summary": stmt.excluded.evaluation_summary,
+                "status": stmt.excluded.status,
+                "updated_at": func.now()
+            }
+        )
+        with sync_session_factory() as session:
+            session.execute(stmt)
+            session.commit()
+
+    @staticmethod
+    def get_session_data(session_id: str):
+        """
+        The EvaluationStore record of an evaluated candidate, rebuilt from their
+        candidates row after the session expired. The CV text and analysis aren't
+        persisted, so they are missing. None when there is no row.
+        """
+        try:
+            uuid.UUID(session_id)
+        except ValueError:
+            return None
+
+        try:
+            with sync_session_factory() as session:
+                cand = session.execute(select(Candidate).where(Candidate.id == session_id)).scalar_one_or_none()
+        except SQLAlchemyError as e:
+            print(f"[CandidateRepository] Failed to load candidate {session_id}: {str(e)}")
+            return None
+        if cand is None:
+            return None
+
+        return {
+            'first_name': cand.first_name,
+            'last_name': cand.last_name,
+            'email': cand.email,
+            'phone': cand.phone,
+            'file_path': cand.cv_path,
+            'quiz': cand.quiz or {},
+            'responses': cand.responses or {},
+            'evaluation': CandidateRepository._evaluation(cand),
+            'created_at': cand.created_at.isoformat() if cand.created_at else None,
+            'evaluated_at': cand.updated_at.isoformat() if cand.updated_at else None
+        }
+
+    @staticmethod
+    def _evaluation(cand):
+        try:
+            evaluation = json.loads(cand.evaluation_summary) if cand.evaluation_summary else None
+        except ValueError:
+            evaluation = None
+        if isinstance(evaluation, dict):
+            return evaluation
+        return {'raw_evaluation': cand.model_raw, 'recommendation': cand.model_recommendation}
@@ -1,66 +1,96 @@
-import json
-
+from app_config import settings
+from utils.blob_store import BlobStore
 from utils.storage import EvaluationStore
 from .worker import celery
 from db.models import Candidate
 from db.session import sync_session_factory
+from candidates.repositories.candidate_repository import CandidateRepository
+
+
+_candidate_manager = None
+_store = None
+
+# Everything the Candidate row is built from, the CV text stays in Redis
+FINALIZE_FIELDS = ("first_name", "last_name", "email", "phone", "file_path", "quiz", "responses", "evaluation")
 
 
 def get_store():
-    return EvaluationStore()
+    global _store
+    if _store is None:
+        _store = EvaluationStore()
+    return _store
+
+
+def get_candidate_manager():
+    # Imported lazily: the manager module imports this one to dispatch tasks
+    global _candidate_manager
+    if _candidate_manager is None:
+        from managers.candidate_manager import CandidateManager
+        _candidate_manager = CandidateManager()
+    return _candidate_manager
+
+
+@celery.task(acks_late=True)
+def extract_candidate_text(session_id: str):
+    get_candidate_manager().run_extraction_stage(session_id)
+
+
+@celery.task(acks_late=True)
+def analyze_candidate_cv(session_id: str):
+    get_candidate_manager().run_analysis_stage(session_id)
+
+
+@celery.task(acks_late=True)
+def generate_candidate_quiz(session_id: str):
+    get_candidate_manager().run_quiz_stage(session_id)
+
+
+@celery.task(acks_late=True)
+def assemble_candidate_session(session_id: str):
+    get_candidate_manager().run_assemble_stage(session_id)
+
+
+@celery.task(acks_late=True)
+def process_batch_file(job_id: str):
+    return get_candidate_manager().run_batch_file(job_id)
+
+
+@celery.task(acks_late=True)
+def finalize_upload_batch(chunk_results, batch_id: str):
+    get_candidate_manager().finalize_batch(batch_id, chunk_results)
+
+
+@celery.task
+def evict_upload_blobs():
+    """Enforce upload retention and disk quota, keeping every CV a Candidate row points at"""
+    session = sync_session_factory()
+    try:
+        referenced = {path for (path,) in session.query(Candidate.cv_path).filter(Candidate.cv_path.isnot(None))}
+    finally:
+        session.close()
+
+    store = EvaluationStore()
+    result = BlobStore(settings.UPLOAD_FOLDER).evict(
+        max_bytes=settings.UPLOAD_QUOTA_BYTES,
+        retention_seconds=settings.UPLOAD_RETENTION_DAYS * 24 * 3600,
+        referenced=referenced,
+        # Sessions still in the store may not have reached the candidates table yet
+        min_age_seconds=store.ttl
+    )
+    print(f"[Uploads] Evicted {result['removed']['files']} files ({result['removed']['bytes']} bytes), "
+          f"{result['remaining_bytes']} bytes remain")
+    return result
 
 
 @celery.task(bind=True, max_retries=3, default_retry_delay=10, acks_late=True)
 def finalize_candidate_evaluation(self, session_id: str):
-    session = None
-    redis_store = get_store()
     try:
-        session = sync_session_factory()
-        data = redis_store.get(session_id)
-
+        data = get_store().get_fields(session_id, FINALIZE_FIELDS)
         if not data:
             raise ValueError(f"No data found for session {session_id}")
 
-        print("FINAL DATA FOR ORM:", json.dumps(data, indent=2))
-
-        cand = session.query(Candidate).filter_by(id=session_id).one_or_none()
-
-        if cand:
-            cand.first_name = data.get("first_name") or cand.first_name
-            cand.last_name = data.get("last_name") or cand.last_name
-            cand.email = data.get("email") or cand.email
-            cand.phone = data.get("phone") or cand.phone
-            cand.cv_path = data.get("file_path") or cand.cv_path
-            cand.quiz = data.get("quiz") or cand.quiz
-            cand.responses = data.get("responses") or cand.responses
-            cand.model_raw = data.get("evaluation", {}).get("raw_evaluation") or cand.model_raw
-            cand.model_recommendation = data.get("evaluation", {}).get("recommendation") or cand.model_recommendation
-            cand.evaluation_summary = json.dumps(data.get("evaluation")) or cand.evaluation_summary
-            cand.status = "completed"
-        else:
-            cand = Candidate(
-                id=session_id,
-                first_name=data.get("first_name"),
-                last_name=data.get("last_name"),
-                email=data.get("email"),
-                phone=data.get("phone"),
-                cv_path=data.get("file_path"),
-                quiz=data.get("quiz"),
-                responses=data.get("responses"),
-                model_raw=data.get("evaluation", {}).get("raw_evaluation"),
-                model_recommendation=data.get("evaluation", {}).get("recommendation"),
-                evaluation_summary=json.dumps(data.get("evaluation")),
-                status="completed"
-            )
-            session.add(cand)
-
-        session.commit()
+        CandidateRepository.upsert_evaluation(session_id, data)
         return {"status": "ok"}
 
     except Exception as exc:
-        if session:
-            session.rollback()
         raise self.retry(exc=exc)
-    finally:
-        if session:
-            session.close()
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_init
 from app_config import settings
 
 celery = Celery(
@@ -15,5 +16,18 @@ celery.conf.update({
     'enable_utc': True,
     'task_acks_late': True,
     'worker_prefetch_multiplier': 1,
-    'imports': ('celery_app.tasks',)
+    'imports': ('celery_app.tasks',),
+    'beat_schedule': {
+        'evict-upload-blobs': {
+            'task': 'celery_app.tasks.evict_upload_blobs',
+            'schedule': settings.UPLOAD_EVICTION_INTERVAL_SECONDS
+        }
+    }
 })
+
+
+@worker_init.connect
+def clear_metrics(**kwargs):
+    # Runs in the worker's main process before the pool starts
+    from utils.metrics import REGISTRY
+    REGISTRY.clear()
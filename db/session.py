@@ -1,6 +1,7 @@
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 from app_config import settings
+from utils.metrics import instrument_engine
 
 
 DATABASE_URL = settings.TEST_DATABASE_URL_psycopg if settings.USE_TEST_DATABASE else settings.DATABASE_URL_psycopg
@@ -12,6 +13,7 @@ sync_engine = create_engine(
     pool_size=5,
     max_overflow=10
 )
+instrument_engine(sync_engine)
 
 sync_session_factory = sessionmaker(
     sync_engine,
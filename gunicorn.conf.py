@@ -0,0 +1,7 @@
+"""Gunicorn settings, read from the working directory: gunicorn "app:create_app()" """
+
+
+def on_starting(server):
+    # Runs once in the master before any worker forks, like REGISTRY.clear() in app.py
+    from utils.metrics import REGISTRY
+    REGISTRY.clear()
@@ -1,13 +1,39 @@
 import json
+import math
+import os
+import threading
+import time
+import uuid
+import zipfile
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
-from utils.cleanup import cleanup_old_evaluations
+from app_config import settings
 from utils.file_processor import FileProcessor
 from utils.storage import EvaluationStore
+from candidates.repositories.candidate_repository import CandidateRepository
+from utils.metrics import track_stage
 from services.cv_analyzer import CVAnalyzer
 from services.quiz_generator import QuizGenerator
 from services.response_evaluator import ResponseEvaluator
+from services.exceptions import LLMUnavailableError
 from datetime import datetime
-from celery_app.tasks import finalize_candidate_evaluation
+from celery import chain, chord
+from celery_app.tasks import (
+    finalize_candidate_evaluation,
+    extract_candidate_text,
+    analyze_candidate_cv,
+    generate_candidate_quiz,
+    assemble_candidate_session,
+    process_batch_file,
+    finalize_upload_batch
+)
+
+UPLOAD_JOB_PREFIX = "upload_job:"
+UPLOAD_BATCH_PREFIX = "upload_batch:"
+
+# Everything the results page shows; cv_text is only needed to evaluate
+RESULT_FIELDS = ('analysis', 'quiz', 'responses', 'evaluation', 'evaluated_at', 'created_at')
 
 
 class CandidateManager:
@@ -17,22 +43,36 @@ class CandidateManager:
         self.cv_analyzer = CVAnalyzer()
         self.quiz_generator = QuizGenerator()
         self.response_evaluator = ResponseEvaluator()
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
     def process_candidate(self, file, session_id):
-        cleanup_old_evaluations(self.store)
-        file_path = self.file_processor.save_file(file, session_id)
-        cv_text = self.file_processor.extract_text(file_path)
+        content, file_ext = self.file_processor.read_upload(file)
+        with track_stage("candidate", "save"):
+            file_path = self.file_processor.persist_upload(content, file.filename, session_id)
+        with track_stage("candidate", "extract"):
+            cv_text = self.file_processor.extract_upload(content, file_ext)
 
         # Analyze and generate quiz
-        analysis = self.cv_analyzer.analyze_cv(cv_text)
-        quiz = self.quiz_generator.generate_quiz(cv_text)
+        analysis, quiz = self._analyze_and_generate_quiz(cv_text)
+
+        data = self._build_candidate_data(cv_text, analysis, quiz, file_path)
 
-        data = {
+        with track_stage("candidate", "store"):
+            self.store.set(session_id, data)
+        return data
+
+    def _timed(self, stage, fn, *args):
+        with track_stage("candidate", stage):
+            return fn(*args)
+
+    def _build_candidate_data(self, cv_text, analysis, quiz, file_path, created_at=None):
+        return {
             'cv_text': cv_text,
             'analysis': analysis,
             'quiz': quiz,
             'file_path': file_path,
-            'created_at': datetime.now().isoformat(),
+            'created_at': created_at or datetime.now().isoformat(),
             'first_name': analysis.get('first_name'),
             'last_name': analysis.get('last_name'),
             'email': analysis.get('email'),
@@ -40,40 +80,352 @@ class CandidateManager:
 
         }
 
-        self.store.set(session_id, data)
-        return data
+    def queue_candidate(self, file, session_id):
+        """
+        Save the upload and run extraction, analysis and quiz generation as Celery tasks.
+        The session id doubles as the job id; progress is read with get_job_status.
+        """
+        file_path = self.file_processor.save_file(file, session_id)
+
+        job = {
+            'job_id': session_id,
+            'status': 'queued',
+            'file_path': file_path,
+            'created_at': datetime.now().isoformat()
+        }
+        self.store.set(self._job_key(session_id), job)
+
+        chain(
+            extract_candidate_text.si(session_id),
+            chord(
+                [analyze_candidate_cv.si(session_id), generate_candidate_quiz.si(session_id)],
+                assemble_candidate_session.si(session_id)
+            )
+        ).apply_async()
+        return job
+
+    def _job_key(self, job_id, stage=None):
+        key = f"{UPLOAD_JOB_PREFIX}{job_id}"
+        return f"{key}:{stage}" if stage else key
+
+    def _get_job(self, job_id):
+        job = self.store.get(self._job_key(job_id))
+        if not job:
+            raise KeyError("Job not found")
+        return job
+
+    def run_extraction_stage(self, job_id):
+        job = self._get_job(job_id)
+        try:
+            with track_stage("candidate", "extract"):
+                cv_text = self.file_processor.extract_text_cached(job['file_path'])
+        except Exception as e:
+            job.update({'status': 'failed', 'error': str(e)})
+            self.store.set(self._job_key(job_id), job)
+            raise
+
+        if self.file_processor.is_extraction_error(cv_text):
+            # Raising stops the chain, so the LLM stages never see the error text
+            job.update({'status': 'failed', 'error': cv_text})
+            self.store.set(self._job_key(job_id), job)
+            raise ValueError(cv_text)
+
+        job.update({
+            'status': 'processing',
+            'cv_text': cv_text,
+            'extracted_at': datetime.now().isoformat()
+        })
+        self.store.set(self._job_key(job_id), job)
+
+    def run_analysis_stage(self, job_id):
+        cv_text = self._get_job(job_id).get('cv_text', '')
+        try:
+            analysis = self._timed("analyze", self.cv_analyzer.analyze_cv, cv_text)
+        except Exception as e:
+            analysis = {"error": f"Error: {e}"}
+        self.store.set(self._job_key(job_id, 'analysis'), analysis)
+
+    def run_quiz_stage(self, job_id):
+        cv_text = self._get_job(job_id).get('cv_text', '')
+        try:
+            quiz = self._timed("quiz", self.quiz_generator.generate_quiz, cv_text)
+        except Exception as e:
+            quiz = {"technical_questions": [f"Error generating quiz: {e}"], "soft_skills_questions": []}
+        self.store.set(self._job_key(job_id, 'quiz'), quiz)
+
+    def run_assemble_stage(self, job_id):
+        job = self._get_job(job_id)
+        analysis = self.store.get(self._job_key(job_id, 'analysis')) or {}
+        quiz = self.store.get(self._job_key(job_id, 'quiz')) or {}
+
+        data = self._build_candidate_data(job.get('cv_text', ''), analysis, quiz,
+                                          job['file_path'], job.get('created_at'))
+        self.store.set(job_id, data)
+
+        job.pop('cv_text', None)
+        job.update({'status': 'completed', 'completed_at': datetime.now().isoformat()})
+        self.store.set(self._job_key(job_id), job)
+        self.store.delete(self._job_key(job_id, 'analysis'))
+        self.store.delete(self._job_key(job_id, 'quiz'))
+
+    def get_job_status(self, job_id):
+        job = self.store.get(self._job_key(job_id))
+        if not job:
+            return None
+
+        completed = job.get('status') == 'completed'
+        status = {
+            'job_id': job_id,
+            'status': job.get('status'),
+            'stages': {
+                'extracted': 'extracted_at' in job,
+                'analyzed': completed or self.store.get(self._job_key(job_id, 'analysis')) is not None,
+                'quiz_ready': completed or self.store.get(self._job_key(job_id, 'quiz')) is not None
+            }
+        }
+        if job.get('error'):
+            status['error'] = job['error']
+        if completed:
+            data = self.store.get_fields(job_id, ('analysis', 'quiz')) or {}
+            status['analysis'] = data.get('analysis')
+            status['quiz'] = data.get('quiz')
+        return status
+
+    def queue_batch(self, archive, batch_id):
+        """
+        Store every CV in a ZIP upload and process them on Celery, at most
+        BULK_UPLOAD_CONCURRENCY files at a time. Entries are streamed one by one
+        from the archive into the blob store, never unpacked as a whole.
+        """
+        created_at = datetime.now().isoformat()
+        files, skipped = [], []
+
+        with zipfile.ZipFile(archive.stream) as zf:
+            for info in zf.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                    continue
+                if not self.file_processor.allowed_file(name):
+                    skipped.append({'filename': info.filename, 'error': 'Unsupported file type'})
+                    continue
+                if info.file_size > settings.BULK_UPLOAD_MAX_ENTRY_BYTES:
+                    skipped.append({'filename': info.filename, 'error': 'File too large'})
+                    continue
+                if len(files) >= settings.BULK_UPLOAD_MAX_FILES:
+                    skipped.append({'filename': info.filename, 'error': 'Too many files in archive'})
+                    continue
+
+                with zf.open(info) as entry:
+                    file_path = self.file_processor.blob_store.put_stream(entry, os.path.splitext(name)[1])
+
+                job_id = str(uuid.uuid4())
+                self.store.set(self._job_key(job_id), {
+                    'job_id': job_id,
+                    'batch_id': batch_id,
+                    'filename': info.filename,
+                    'status': 'queued',
+                    'file_path': file_path,
+                    'created_at': created_at
+                })
+                files.append({'job_id': job_id, 'filename': info.filename})
+
+        batch = {
+            'batch_id': batch_id,
+            'status': 'processing' if files else 'completed',
+            'total': len(files),
+            'files': files,
+            'skipped': skipped,
+            'created_at': created_at
+        }
+        self.store.set(self._batch_key(batch_id), batch)
+
+        if files:
+            chunk_size = math.ceil(len(files) / settings.BULK_UPLOAD_CONCURRENCY)
+            chord(
+                process_batch_file.chunks([(f['job_id'],) for f in files], chunk_size).group(),
+                finalize_upload_batch.s(batch_id)
+            ).apply_async()
+        return batch
+
+    def _batch_key(self, batch_id):
+        return f"{UPLOAD_BATCH_PREFIX}{batch_id}"
+
+    def run_batch_file(self, job_id):
+        """Extract, analyze and build the quiz for one archive entry; a failure only fails that file"""
+        try:
+            self.run_extraction_stage(job_id)
+            job = self._get_job(job_id)
+            cv_text = job.pop('cv_text', '')
+
+            analysis, quiz = self._analyze_and_generate_quiz(cv_text)
+            data = self._build_candidate_data(cv_text, analysis, quiz, job['file_path'], job.get('created_at'))
+            self.store.set(job_id, data)
+
+            job.update({'status': 'completed', 'completed_at': datetime.now().isoformat()})
+            self.store.set(self._job_key(job_id), job)
+            return {'job_id': job_id, 'status': 'completed'}
+        except Exception as e:
+            job = self.store.get(self._job_key(job_id)) or {'job_id': job_id}
+            job.pop('cv_text', None)
+            job.update({'status': 'failed', 'error': str(e)})
+            self.store.set(self._job_key(job_id), job)
+            return {'job_id': job_id, 'status': 'failed', 'error': str(e)}
+
+    def finalize_batch(self, batch_id, chunk_results):
+        """Chord callback: record the outcome of every file on the batch"""
+        batch = self.store.get(self._batch_key(batch_id))
+        if not batch:
+            return
+
+        results = [result for chunk in chunk_results for result in chunk]
+        batch.update({
+            'status': 'completed',
+            'completed': sum(1 for r in results if r.get('status') == 'completed'),
+            'failed': sum(1 for r in results if r.get('status') == 'failed'),
+            'completed_at': datetime.now().isoformat()
+        })
+        self.store.set(self._batch_key(batch_id), batch)
+
+    def get_batch_status(self, batch_id):
+        batch = self.store.get(self._batch_key(batch_id))
+        if not batch:
+            return None
+
+        counts = {'queued': 0, 'processing': 0, 'completed': 0, 'failed': 0}
+        files = []
+        for entry in batch['files']:
+            job = self.store.get(self._job_key(entry['job_id'])) or {}
+            status = job.get('status', 'queued')
+            counts[status] = counts.get(status, 0) + 1
+
+            item = {'job_id': entry['job_id'], 'filename': entry['filename'], 'status': status}
+            if job.get('error'):
+                item['error'] = job['error']
+            if status == 'completed':
+                data = self.store.get_fields(entry['job_id'], ('first_name', 'last_name', 'email')) or {}
+                item.update({k: data.get(k) for k in ('first_name', 'last_name', 'email')})
+            files.append(item)
+
+        return {
+            'batch_id': batch_id,
+            'status': batch['status'],
+            'total': batch['total'],
+            'progress': counts,
+            'files': files,
+            'skipped': batch.get('skipped', []),
+            'created_at': batch.get('created_at'),
+            'completed_at': batch.get('completed_at')
+        }
+
+    def _get_executor(self):
+        # The manager is shared by request threads, concurrent first uploads must not each build one
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=settings.LLM_PIPELINE_WORKERS,
+                                                        thread_name_prefix="candidate-llm")
+        return self._executor
+
+    def _analyze_and_generate_quiz(self, cv_text):
+        """
+        Run CV analysis and quiz generation, concurrently when enabled.
+        A failed or timed out call degrades to the same error shape the service
+        itself returns, so a broken quiz never discards a good analysis.
+        Only when the provider is unavailable for both calls is the error raised.
+        The shared deadline is also each call's HTTP timeout, so a call that
+        misses it stops and frees its pool thread instead of running on.
+        """
+        analysis_fallback = lambda error: {"error": f"Error: {error}"}
+        quiz_fallback = lambda error: {"technical_questions": [f"Error generating quiz: {error}"],
+                                       "soft_skills_questions": []}
+
+        if settings.CANDIDATE_PIPELINE_CONCURRENT:
+            executor = self._get_executor()
+            deadline = time.monotonic() + settings.LLM_CALL_TIMEOUT_SECONDS
+            analysis_future = executor.submit(self._timed, "analyze", self.cv_analyzer.analyze_cv, cv_text, deadline)
+            quiz_future = executor.submit(self._timed, "quiz", self.quiz_generator.generate_quiz, cv_text, deadline)
+
+            analysis, analysis_error = self._collect(analysis_future, deadline, analysis_fallback)
+            quiz, quiz_error = self._collect(quiz_future, deadline, quiz_fallback)
+        else:
+            analysis, analysis_error = self._run_with_fallback(
+                partial(self._timed, "analyze", self.cv_analyzer.analyze_cv), cv_text, analysis_fallback)
+            quiz, quiz_error = self._run_with_fallback(
+                partial(self._timed, "quiz", self.quiz_generator.generate_quiz), cv_text, quiz_fallback)
+
+        if isinstance(analysis_error, LLMUnavailableError) and isinstance(quiz_error, LLMUnavailableError):
+            raise analysis_error
+        return analysis, quiz
+
+    def _run_with_fallback(self, fn, cv_text, fallback):
+        try:
+            return fn(cv_text), None
+        except Exception as e:
+            return fallback(str(e)), e
+
+    def _collect(self, future, deadline, fallback):
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic())), None
+        except FutureTimeoutError as e:
+            future.cancel()
+            return fallback(f"timed out after {settings.LLM_CALL_TIMEOUT_SECONDS}s"), e
+        except Exception as e:
+            return fallback(str(e)), e
 
     def get_quiz(self, session_id: str):
-        data = self.store.get(session_id)
-        if not data:
+        data = self.store.get_fields(session_id, ('quiz',))
+        if data is None:
             raise KeyError("Session not found")
         return data.get('quiz', {})
 
     def evaluate_responses(self, session_id: str, responses: dict):
-        data = self.store.get(session_id)
-        if not data:
+        data = self.store.get_fields(session_id, ('cv_text', 'quiz'))
+        if data is None:
             raise KeyError("Session not found")
 
         cv_text = data.get('cv_text', '')
         quiz = data.get('quiz', {})
 
-        evaluation = self.response_evaluator.evaluate_responses(cv_text, quiz, responses)
+        with track_stage("candidate", "evaluate"):
+            evaluation = self.response_evaluator.evaluate_responses(cv_text, quiz, responses)
         print("RAW AI RESULT:", evaluation)
 
-        data.update({
-            'evaluation': evaluation,
-            'responses': responses,
-            'evaluated_at': datetime.now().isoformat()
-        })
-        self.store.set(session_id, data)
-        finalize_candidate_evaluation.apply_async(args=[session_id], countdown=0)
+        self._save_evaluation(session_id, evaluation, responses)
         return evaluation
 
+    def stream_evaluate_responses(self, session_id: str, responses: dict):
+        """
+        Generator of (section, value) pairs from the streaming evaluator.
+        The final ("result", evaluation) pair is stored and finalized before it is yielded.
+        """
+        data = self.store.get_fields(session_id, ('cv_text', 'quiz'))
+        if data is None:
+            raise KeyError("Session not found")
+
+        cv_text = data.get('cv_text', '')
+        quiz = data.get('quiz', {})
+
+        for section, value in self.response_evaluator.stream_evaluation(cv_text, quiz, responses):
+            if section == "result":
+                self._save_evaluation(session_id, value, responses)
+            yield section, value
+
+    def _save_evaluation(self, session_id, evaluation, responses):
+        with track_stage("candidate", "store"):
+            self.store.update(session_id, {
+                'evaluation': evaluation,
+                'responses': responses,
+                'evaluated_at': datetime.now().isoformat()
+            })
+        finalize_candidate_evaluation.apply_async(args=[session_id], countdown=0)
+
     def get_results(self, session_id: str):
-        return self.store.get(session_id)
+        # Expired sessions are rebuilt from the candidates row
+        return self.store.get_or_load(session_id, RESULT_FIELDS, CandidateRepository.get_session_data,
+                                      settings.REHYDRATED_SESSION_TTL_SECONDS)
 
     def exists(self, session_id: str) -> bool:
-        return self.store.get(session_id) is not None
+        return self.store.exists(session_id)
 
     def delete(self, session_id: str):
         self.store.delete(session_id)
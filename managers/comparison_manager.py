@@ -1,10 +1,15 @@
 from datetime import datetime
 
-from utils.cleanup import cleanup_old_evaluations
 from utils.storage import EvaluationStore
+from utils.metrics import track_stage
 from services.cv_comparator import CVComparator
+from services.exceptions import LLMUnavailableError
 from utils.file_processor import FileProcessor
 
+# The results page never shows the extracted CV texts
+RESULT_FIELDS = ("cv1_name", "cv2_name", "cv1_path", "cv2_path", "comparison_result",
+                 "questions", "summary", "created_at", "type")
+
 
 class ComparisonManager:
     def __init__(self):
@@ -13,15 +18,29 @@ class ComparisonManager:
         self.comparator = CVComparator()
 
     def process_comparison(self, session_id, cv1_file, cv2_file, cv1_name, cv2_name):
-        cleanup_old_evaluations(self.store)
-        cv1_path = self.file_processor.save_file(cv1_file, f"{session_id}_cv1")
-        cv2_path = self.file_processor.save_file(cv2_file, f"{session_id}_cv2")
+        cv1_content, cv1_ext = self.file_processor.read_upload(cv1_file)
+        cv2_content, cv2_ext = self.file_processor.read_upload(cv2_file)
+
+        with track_stage("comparison", "save"):
+            cv1_path = self.file_processor.persist_upload(cv1_content, cv1_file.filename, f"{session_id}_cv1")
+            cv2_path = self.file_processor.persist_upload(cv2_content, cv2_file.filename, f"{session_id}_cv2")
 
-        cv1_text = self.file_processor.extract_text(cv1_path)
-        cv2_text = self.file_processor.extract_text(cv2_path)
+        with track_stage("comparison", "extract"):
+            cv1_text = self.file_processor.extract_upload(cv1_content, cv1_ext)
+            cv2_text = self.file_processor.extract_upload(cv2_content, cv2_ext)
 
-        comparison_result = self.comparator.compare_cvs(cv1_text, cv2_text, cv1_name, cv2_name)
-        questions = self.comparator.generate_comparison_questions(comparison_result)
+        # Without a comparison there is nothing to show, so LLMUnavailableError propagates (503);
+        # failing to get questions only degrades the result
+        with track_stage("comparison", "compare"):
+            comparison_result = self.comparator.compare_cvs(cv1_text, cv2_text, cv1_name, cv2_name)
+        try:
+            with track_stage("comparison", "questions"):
+                questions = self.comparator.generate_comparison_questions(comparison_result)
+        except LLMUnavailableError as e:
+            questions = [{"question": f"Error: {e}",
+                          "category": "error",
+                          "priority": "low",
+                          "context": "System error occurred"}]
         summary = self.comparator.format_comparison_summary(comparison_result, questions)
 
         data = {
@@ -38,14 +57,15 @@ class ComparisonManager:
             "type": "comparison"
         }
 
-        self.store.set(session_id, data)
+        with track_stage("comparison", "store"):
+            self.store.set(session_id, data)
         return data
 
     def get_results(self, session_id):
-        return self.store.get(session_id)
+        return self.store.get_fields(session_id, RESULT_FIELDS)
 
     def exists(self, session_id):
-        return self.store.get(session_id) is not None
+        return self.store.exists(session_id)
 
     def delete(self, session_id):
         self.store.delete(session_id)
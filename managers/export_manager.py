@@ -1,16 +1,26 @@
 import json
 import tempfile
 from datetime import datetime
+from app_config import settings
 from utils.storage import EvaluationStore
+from candidates.repositories.candidate_repository import CandidateRepository
 from renderers.html_report import render_html_report
+from utils.metrics import track_stage
+
+EXPORT_FIELDS = ("created_at", "evaluated_at", "analysis", "quiz", "responses", "evaluation")
 
 
 class ExportManager:
     def __init__(self):
         self.store = EvaluationStore()
 
+    def _get_data(self, session_id):
+        # Expired sessions are rebuilt from the candidates row
+        return self.store.get_or_load(session_id, EXPORT_FIELDS, CandidateRepository.get_session_data,
+                                      settings.REHYDRATED_SESSION_TTL_SECONDS)
+
     def export_json(self, session_id):
-        data = self.store.get(session_id)
+        data = self._get_data(session_id)
         if not data:
             return None, "Session not found"
 
@@ -32,11 +42,12 @@ class ExportManager:
         return temp_file.name, None
 
     def export_pdf(self, session_id):
-        data = self.store.get(session_id)
+        data = self._get_data(session_id)
         if not data:
             return None, "Session not found"
 
-        html_content = render_html_report(session_id, data)
+        with track_stage("export", "render"):
+            html_content = render_html_report(session_id, data)
 
         temp_file = tempfile.NamedTemporaryFile(mode="w", suffix=".html", delete=False)
         temp_file.write(html_content)
@@ -1,4 +1,5 @@
 from .candidates import bp as candidates_bp
 from .comparison import bp as comparison_bp
 from .export import bp as export_bp
-from .auth import bp as auth_bp
\ No newline at end of file
+from .auth import bp as auth_bp
+from .metrics import bp as metrics_bp
\ No newline at end of file
@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify, render_template, session, redirect, url_for
+from flask import Blueprint, request, jsonify, render_template, session, redirect, url_for, Response, stream_with_context
+import json
 import uuid
+import zipfile
+from app_config import settings
 from managers.candidate_manager import CandidateManager
+from services.exceptions import LLMUnavailableError
 from middlewares.auth import login_required
 
 bp = Blueprint("candidates", __name__)
@@ -26,6 +30,15 @@ def upload_cv():
         session_id = str(uuid.uuid4())
         session['candidate_id'] = session_id
 
+        if settings.ASYNC_UPLOAD_PIPELINE or request.form.get('async') == '1':
+            manager.queue_candidate(file, session_id)
+            return jsonify({
+                'success': True,
+                'session_id': session_id,
+                'job_id': session_id,
+                'status_url': url_for('candidates.upload_status', job_id=session_id)
+            }), 202
+
         result = manager.process_candidate(file, session_id)
 
         return jsonify({
@@ -35,9 +48,53 @@ def upload_cv():
             'quiz': result.get('quiz')
         })
 
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route("/upload/status/<job_id>", methods=["GET"])
+def upload_status(job_id):
+    status = manager.get_job_status(job_id)
+    if not status:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status)
+
+
+@bp.route("/upload/bulk", methods=["POST"])
+def upload_bulk():
+    if 'archive' not in request.files:
+        return jsonify({'error': 'No archive uploaded'}), 400
+
+    archive = request.files['archive']
+    if not archive.filename.lower().endswith('.zip'):
+        return jsonify({'error': 'Bulk upload expects a .zip archive'}), 400
+
+    batch_id = str(uuid.uuid4())
+    try:
+        batch = manager.queue_batch(archive, batch_id)
+    except zipfile.BadZipFile:
+        return jsonify({'error': 'Archive is not a valid ZIP file'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    return jsonify({
+        'success': True,
+        'batch_id': batch_id,
+        'total': batch['total'],
+        'skipped': batch['skipped'],
+        'status_url': url_for('candidates.upload_bulk_status', batch_id=batch_id)
+    }), 202
+
+
+@bp.route("/upload/bulk/<batch_id>", methods=["GET"])
+def upload_bulk_status(batch_id):
+    status = manager.get_batch_status(batch_id)
+    if not status:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(status)
+
 
 @bp.route("/quiz", methods=["GET"])
 def quiz_page():
@@ -72,10 +129,40 @@ def evaluate_responses():
             'evaluation': evaluation
         })
 
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route("/evaluate/stream", methods=["POST"])
+def evaluate_responses_stream():
+    if 'candidate_id' not in session:
+        return jsonify({'error': 'No active session'}), 400
+
+    session_id = session['candidate_id']
+    if not manager.exists(session_id):
+        return jsonify({'error': 'Session expired'}), 400
+
+    payload = request.get_json(force=True, silent=True) or {}
+    responses = payload.get('responses', {})
+
+    def events():
+        # Server-Sent Events: one event per completed section, then "done"
+        try:
+            for section, value in manager.stream_evaluate_responses(session_id, responses):
+                if section == "result":
+                    section, value = "done", {'success': True, 'evaluation': value}
+                yield f"event: {section}\ndata: {json.dumps(value)}\n\n"
+        except LLMUnavailableError as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e), 'retry_after': e.retry_after})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @bp.route("/results", methods=["GET"])
 def results_page():
     if 'candidate_id' not in session:
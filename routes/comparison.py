@@ -1,6 +1,7 @@
 import uuid
 from flask import Blueprint, request, jsonify, render_template, session, redirect, url_for
 from managers.comparison_manager import ComparisonManager
+from services.exceptions import LLMUnavailableError
 
 
 bp = Blueprint('comparison', __name__, url_prefix="/compare")
@@ -46,6 +47,8 @@ def upload_compare_cvs():
             "summary": result["summary"]
         })
 
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
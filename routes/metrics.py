@@ -0,0 +1,13 @@
+from flask import Blueprint, Response, abort
+
+from app_config import settings
+from utils.metrics import REGISTRY, CONTENT_TYPE
+
+bp = Blueprint("metrics", __name__)
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    if not settings.METRICS_ENABLED:
+        abort(404)
+    return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
@@ -1,23 +1,230 @@
-import openai
+import asyncio
+import time
+import weakref
+
 from app_config import settings
+from services.exceptions import LLMRequestError, LLMTimeoutError
+from services.llm_cache import get_llm_cache, make_cache_key
+from services.llm_backends import get_llm_client, get_async_llm_client
+from services.rate_limiter import get_rate_limiter, estimate_tokens
+from services.resilience import call_with_resilience, acall_with_resilience, classify_error, get_circuit_breaker
+from utils.metrics import track_llm_call
+
+# One semaphore per event loop, asyncio primitives can't be shared between loops
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.LLM_ASYNC_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+def _messages(system_prompt, user_prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _timeout_option(deadline):
+    """The per-request timeout left before deadline (time.monotonic()), as create() kwargs"""
+    if deadline is None:
+        return {}
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise LLMTimeoutError("LLM call deadline passed before the request was sent")
+    return {"timeout": remaining}
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
 
 
 class BaseOpenAIService:
     def __init__(self):
-        openai.api_key = settings.OPENAI_API_KEY
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.cache = get_llm_cache()
+        self.rate_limiter = get_rate_limiter()
 
-    def chat(self, system_prompt: str, user_prompt: str, model="gpt-4", max_tokens=1500, temperature=0.3):
+    @property
+    def client(self):
+        # Resolved per call so a forked worker never reuses its parent's sockets,
+        # and so LLM_BACKEND can route calls to the fake or record/replay backends
+        return get_llm_client()
+
+    def chat(self, system_prompt: str, user_prompt: str, model="gpt-4", max_tokens=1500, temperature=0.3,
+             deadline=None):
+        """
+        Returns the completion, or an "Error: ..." string when the provider rejects
+        the request. LLMUnavailableError (retries exhausted, circuit open) propagates
+        so managers can fall back or answer 503.
+        """
         try:
-            response = self.client.chat.completions.create(
+            return self.complete(system_prompt, user_prompt, model, max_tokens, temperature, deadline)
+        except LLMRequestError as e:
+            return f"Error: {str(e)}"
+
+    def complete(self, system_prompt: str, user_prompt: str, model="gpt-4", max_tokens=1500, temperature=0.3,
+                 deadline=None):
+        """
+        Like chat, but every failure is raised as a typed LLMError. With a deadline
+        (time.monotonic()) each HTTP request times out at it, so the call really stops.
+        """
+        service_name = type(self).__name__
+        with track_llm_call(service_name, model) as call:
+            cache_key = None
+            if self.cache is not None:
+                cache_key = make_cache_key(model, system_prompt, user_prompt, max_tokens, temperature)
+                cached = self.cache.get(cache_key, service=service_name)
+                if cached is not None:
+                    call.outcome = "cached"
+                    return cached
+
+            estimated = estimate_tokens(system_prompt, user_prompt, max_tokens)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(model, estimated)
+
+            response = call_with_resilience(model, lambda: self.client.chat.completions.create(
+                model=model,
+                messages=_messages(system_prompt, user_prompt),
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **_timeout_option(deadline)
+            ), deadline=deadline)
+            content = response.choices[0].message.content
+
+            call.tokens = _usage_tokens(response)
+            if self.rate_limiter is not None:
+                self.rate_limiter.settle(model, estimated, call.tokens)
+
+            # Only successful completions are cached, errors are always retried
+            if self.cache is not None and content:
+                self.cache.set(cache_key, content, service=service_name)
+            return content
+
+    def chat_stream(self, system_prompt: str, user_prompt: str, model="gpt-4", max_tokens=1500, temperature=0.3):
+        """
+        Yield the completion as text deltas. Unlike chat, provider errors are raised,
+        since part of the answer may already have been consumed by the caller.
+        Only opening the stream is retried.
+        """
+        service_name = type(self).__name__
+        with track_llm_call(service_name, model) as call:
+            cache_key = None
+            if self.cache is not None:
+                cache_key = make_cache_key(model, system_prompt, user_prompt, max_tokens, temperature)
+                cached = self.cache.get(cache_key, service=service_name)
+                if cached is not None:
+                    call.outcome = "cached"
+                    yield cached
+                    return
+
+            estimated = estimate_tokens(system_prompt, user_prompt, max_tokens)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(model, estimated)
+
+            # The last chunk then carries the usage, for settling the rate limiter like complete()
+            stream = call_with_resilience(model, lambda: self.client.chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=_messages(system_prompt, user_prompt),
                 max_tokens=max_tokens,
-                temperature=temperature
-            )
-            return response.choices[0].message.content
-        except Exception as e:
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            ))
+
+            parts = []
+            try:
+                for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        call.tokens = chunk.usage.total_tokens
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            except Exception as e:
+                error = classify_error(e)
+                if not isinstance(error, LLMRequestError):
+                    get_circuit_breaker(model).record_failure()
+                raise error from e
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.settle(model, estimated, call.tokens)
+
+            content = "".join(parts)
+            if self.cache is not None and content:
+                self.cache.set(cache_key, content, service=service_name)
+
+
+class AsyncBaseOpenAIService:
+    """
+    Awaitable counterpart of BaseOpenAIService. At most LLM_ASYNC_MAX_CONCURRENCY
+    calls per event loop are in flight; a call exceeding the timeout is cancelled.
+    """
+
+    def __init__(self):
+        self.cache = get_llm_cache()
+        self.rate_limiter = get_rate_limiter()
+
+    @property
+    def async_client(self):
+        return get_async_llm_client()
+
+    async def achat(self, system_prompt: str, user_prompt: str, model="gpt-4", max_tokens=1500, temperature=0.3,
+                    timeout=None):
+        """Same contract as BaseOpenAIService.chat"""
+        try:
+            return await self.acomplete(system_prompt, user_prompt, model, max_tokens, temperature, timeout)
+        except LLMRequestError as e:
             return f"Error: {str(e)}"
+
+    async def acomplete(self, system_prompt: str, user_prompt: str, model="gpt-4", max_tokens=1500,
+                        temperature=0.3, timeout=None):
+        service_name = type(self).__name__
+        with track_llm_call(service_name, model) as call:
+            timeout = timeout or settings.LLM_CALL_TIMEOUT_SECONDS
+            cache_key = None
+            if self.cache is not None:
+                cache_key = make_cache_key(model, system_prompt, user_prompt, max_tokens, temperature)
+                # The shared cache tier is a blocking Redis read, keep it off the event loop
+                cached = await asyncio.to_thread(self.cache.get, cache_key, service=service_name)
+                if cached is not None:
+                    call.outcome = "cached"
+                    return cached
+
+            async def attempt():
+                # The semaphore is held per attempt, never while backing off
+                async with _get_semaphore():
+                    try:
+                        return await asyncio.wait_for(
+                            self.async_client.chat.completions.create(
+                                model=model,
+                                messages=_messages(system_prompt, user_prompt),
+                                max_tokens=max_tokens,
+                                temperature=temperature
+                            ),
+                            timeout=timeout
+                        )
+                    except asyncio.TimeoutError:
+                        raise LLMTimeoutError(f"LLM call timed out after {timeout}s")
+
+            estimated = estimate_tokens(system_prompt, user_prompt, max_tokens)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(model, estimated)
+
+            response = await acall_with_resilience(model, attempt)
+            content = response.choices[0].message.content
+
+            call.tokens = _usage_tokens(response)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.asettle(model, estimated, call.tokens)
+
+            if self.cache is not None and content:
+                await asyncio.to_thread(self.cache.set, cache_key, content, service=service_name)
+            return content
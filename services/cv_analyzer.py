@@ -1,24 +1,35 @@
 import json
 
 from prompts.cv_prompts import cv_analysis_prompt, cv_analysis_system_prompt
-from services.base_service import BaseOpenAIService
+from services.base_service import BaseOpenAIService, AsyncBaseOpenAIService
 
 
-class CVAnalyzer(BaseOpenAIService):
+class CVAnalyzer(BaseOpenAIService, AsyncBaseOpenAIService):
     
-    def analyze_cv(self, cv_text):
+    def analyze_cv(self, cv_text, deadline=None):
         """
         Analyze CV and extract key information about the candidate
         """
-        user_prompt = cv_analysis_prompt(cv_text)
-        result = self.chat(
-            system_prompt=cv_analysis_system_prompt(),
-            user_prompt=user_prompt,
-            model="gpt-3.5-turbo",
-            max_tokens=1000,
-            temperature=0.3
-        )
+        result = self.chat(**self._analysis_request(cv_text), deadline=deadline)
+        return self._parse_analysis(result)
 
+    async def aanalyze_cv(self, cv_text):
+        """
+        Awaitable version of analyze_cv
+        """
+        result = await self.achat(**self._analysis_request(cv_text))
+        return self._parse_analysis(result)
+
+    def _analysis_request(self, cv_text):
+        return {
+            "system_prompt": cv_analysis_system_prompt(),
+            "user_prompt": cv_analysis_prompt(cv_text),
+            "model": "gpt-3.5-turbo",
+            "max_tokens": 1000,
+            "temperature": 0.3
+        }
+
+    def _parse_analysis(self, result):
         if result.startswith("Error:"):
             return {"error": result}
 
@@ -1,23 +1,34 @@
 import json
 from datetime import datetime
 from prompts.comparison_prompts import comparison_prompt, comparison_questions_prompt, compare_cvs_system_prompt, generate_comparison_questions_system_prompt
-from services.base_service import BaseOpenAIService
+from services.base_service import BaseOpenAIService, AsyncBaseOpenAIService
 
 
-class CVComparator(BaseOpenAIService):
+class CVComparator(BaseOpenAIService, AsyncBaseOpenAIService):
     
     def compare_cvs(self, cv1_text, cv2_text, cv1_name="CV 1", cv2_name="CV 2"):
         """
         Compare two CVs and identify differences, gaps, and inconsistencies
         """
-        user_prompt = comparison_prompt(cv1_text, cv2_text, cv1_name, cv2_name)
+        result = self.chat(**self._comparison_request(cv1_text, cv2_text, cv1_name, cv2_name))
+        return self._parse_comparison(result)
 
-        result = self.chat(system_prompt=compare_cvs_system_prompt(),
-                           user_prompt=user_prompt,
-                           model="gpt-4",
-                           max_tokens=2000
-                           )
+    async def acompare_cvs(self, cv1_text, cv2_text, cv1_name="CV 1", cv2_name="CV 2"):
+        """
+        Awaitable version of compare_cvs
+        """
+        result = await self.achat(**self._comparison_request(cv1_text, cv2_text, cv1_name, cv2_name))
+        return self._parse_comparison(result)
+
+    def _comparison_request(self, cv1_text, cv2_text, cv1_name, cv2_name):
+        return {
+            "system_prompt": compare_cvs_system_prompt(),
+            "user_prompt": comparison_prompt(cv1_text, cv2_text, cv1_name, cv2_name),
+            "model": "gpt-4",
+            "max_tokens": 2000
+        }
 
+    def _parse_comparison(self, result):
         if result.startswith("Error:"):
             return {"error": result,
                     "format": "error"}
@@ -34,21 +45,36 @@ class CVComparator(BaseOpenAIService):
         """
         if isinstance(comparison_result, dict) and comparison_result.get("format") == "error":
             return []
-        
+
+        result = self.chat(**self._questions_request(comparison_result))
+        return self._parse_questions(result)
+
+    async def agenerate_comparison_questions(self, comparison_result):
+        """
+        Awaitable version of generate_comparison_questions
+        """
+        if isinstance(comparison_result, dict) and comparison_result.get("format") == "error":
+            return []
+
+        result = await self.achat(**self._questions_request(comparison_result))
+        return self._parse_questions(result)
+
+    def _questions_request(self, comparison_result):
         comparison_text = (
             comparison_result.get("raw_analysis")
             if isinstance(comparison_result, dict)
             else str(comparison_result)
         )
-        
-        user_prompt = comparison_questions_prompt(comparison_text)
-        result = self.chat(system_prompt=generate_comparison_questions_system_prompt(),
-                           user_prompt=user_prompt,
-                           model="gpt-4",
-                           max_tokens=1000,
-                           temperature=0.3
-                           )
 
+        return {
+            "system_prompt": generate_comparison_questions_system_prompt(),
+            "user_prompt": comparison_questions_prompt(comparison_text),
+            "model": "gpt-4",
+            "max_tokens": 1000,
+            "temperature": 0.3
+        }
+
+    def _parse_questions(self, result):
         if result.startswith("Error:"):
             return [{"question": result,
                      "category": "error",
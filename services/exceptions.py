@@ -0,0 +1,34 @@
+class LLMError(Exception):
+    def __init__(self, message="LLM request failed"):
+        super().__init__(message)
+
+
+class LLMRequestError(LLMError):
+    """The provider rejected the request itself; retrying will not help"""
+
+    def __init__(self, message="LLM request rejected"):
+        super().__init__(message)
+
+
+class LLMUnavailableError(LLMError):
+    """The provider is degraded; callers should fall back or answer 503"""
+
+    def __init__(self, message="LLM provider unavailable", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMRateLimitError(LLMUnavailableError):
+    def __init__(self, message="LLM rate limit exceeded", retry_after=None):
+        super().__init__(message, retry_after)
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    def __init__(self, message="LLM request timed out", retry_after=None):
+        super().__init__(message, retry_after)
+
+
+class CircuitOpenError(LLMUnavailableError):
+    def __init__(self, model, retry_after=None):
+        super().__init__(f"Circuit open for {model}, failing fast", retry_after)
+        self.model = model
@@ -0,0 +1,429 @@
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from app_config import settings
+from prompts.comparison_prompts import compare_cvs_system_prompt, generate_comparison_questions_system_prompt
+from prompts.cv_prompts import cv_analysis_system_prompt
+from prompts.evaluation_prompts import response_evaluation_system_prompt
+from prompts.quiz_prompts import quiz_system_prompt
+from services.exceptions import LLMRequestError
+from services.llm_cache import make_cache_key
+from services.openai_client import get_openai_client, get_async_openai_client
+
+BACKENDS = ("openai", "fake", "record", "replay")
+
+
+def _request_parts(kwargs):
+    messages = kwargs.get("messages", [])
+    system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user_prompt = next((m["content"] for m in messages if m["role"] == "user"), "")
+    return system_prompt, user_prompt
+
+
+def _request_key(kwargs):
+    system_prompt, user_prompt = _request_parts(kwargs)
+    return make_cache_key(kwargs.get("model"), system_prompt, user_prompt,
+                          kwargs.get("max_tokens"), kwargs.get("temperature"))
+
+
+def _build_completion(model, content, prompt_tokens):
+    completion_tokens = max(1, len(content) // 4)
+    return ChatCompletion.model_validate({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content}
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    })
+
+
+def _build_chunks(model, content, prompt_tokens=None, chunk_size=16):
+    """Content deltas, then a usage-only chunk when prompt_tokens is given (stream_options include_usage)"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    for i in range(0, len(content), chunk_size):
+        yield ChatCompletionChunk.model_validate({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": content[i:i + chunk_size]}, "finish_reason": None}]
+        })
+    if prompt_tokens is not None:
+        completion_tokens = max(1, len(content) // 4)
+        yield ChatCompletionChunk.model_validate({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+
+def _include_usage(kwargs):
+    return bool((kwargs.get("stream_options") or {}).get("include_usage"))
+
+
+def _wait(latency, kwargs):
+    """Sleep for the simulated latency, timing out like httpx when it exceeds the request timeout"""
+    timeout = kwargs.get("timeout")
+    if isinstance(timeout, (int, float)) and latency > timeout:
+        time.sleep(timeout)
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://fake.invalid/v1/chat/completions"))
+    time.sleep(latency)
+
+
+class _Namespace:
+    """Gives a backend the client.chat.completions.create shape the services call"""
+
+    def __init__(self, create):
+        self.chat = self
+        self.completions = self
+        self.create = create
+
+
+class FakeLLM:
+    """
+    Deterministic offline stand-in for the provider. The prompt type is recognised
+    from the system prompt and answered with output the services can parse;
+    latency is sampled from the configured distribution, seeded by the request.
+    """
+
+    def __init__(self, distribution: str, mean_ms: float, stddev_ms: float):
+        self.distribution = distribution
+        self.mean_ms = mean_ms
+        self.stddev_ms = stddev_ms
+        self._generators = {
+            cv_analysis_system_prompt(): self._cv_analysis,
+            quiz_system_prompt(): self._quiz,
+            response_evaluation_system_prompt(): self._evaluation,
+            compare_cvs_system_prompt(): self._comparison,
+            generate_comparison_questions_system_prompt(): self._comparison_questions
+        }
+
+    def respond(self, kwargs):
+        """Return (content, latency_seconds, prompt_tokens) for a create() call"""
+        system_prompt, user_prompt = _request_parts(kwargs)
+        rng = random.Random(_request_key(kwargs))
+        generator = self._generators.get(system_prompt, self._unknown)
+        content = generator(rng)
+        return content, self._latency(rng), (len(system_prompt) + len(user_prompt)) // 4
+
+    def _latency(self, rng):
+        mean = self.mean_ms / 1000
+        stddev = self.stddev_ms / 1000
+        if self.distribution == "fixed" or mean <= 0:
+            return max(0.0, mean)
+        if self.distribution == "uniform":
+            return rng.uniform(max(0.0, mean - stddev), mean + stddev)
+        if self.distribution == "normal":
+            return max(0.0, rng.gauss(mean, stddev))
+        # lognormal: long right tail, like real completion latencies
+        sigma2 = math.log(1 + (stddev / mean) ** 2)
+        return rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+
+    def _cv_analysis(self, rng):
+        first_name = rng.choice(["Anna", "Boris", "Chloe", "Daniel", "Elena", "Farid"])
+        last_name = rng.choice(["Ivanova", "Smith", "Garcia", "Novak", "Kim", "Okafor"])
+        level = rng.choice(["Junior", "Mid", "Senior"])
+        return json.dumps({
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": f"{first_name.lower()}.{last_name.lower()}@example.com",
+            "phone": f"+1-555-{rng.randint(1000, 9999)}",
+            "years_experience": str(rng.randint(1, 12)),
+            "technical_skills": rng.sample(["Apex", "LWC", "SOQL", "Flows", "Aura", "REST APIs", "JavaScript"], 4),
+            "certifications": rng.sample(["Platform Developer I", "Platform Developer II", "Administrator"], 1),
+            "roles": ["Salesforce Developer"],
+            "education": "BSc Computer Science",
+            "projects": ["CPQ implementation", "Service Cloud migration"],
+            "technical_level": level,
+            "strengths": ["Apex triggers", "Integration patterns"],
+            "gaps": ["Limited LWC experience"]
+        })
+
+    def _quiz(self, rng):
+        # Avoid the words QuizGenerator._parse_quiz treats as section headers
+        technical = rng.sample([
+            "How do you keep Apex triggers bulk-safe when processing large data volumes?",
+            "When would you choose a Queueable job over a future method?",
+            "How do governor limits influence the way you write SOQL inside loops?",
+            "Explain how you would expose Salesforce data to an external system via REST.",
+            "What is the difference between a before and an after trigger context?"
+        ], 3)
+        soft = rng.sample([
+            "Describe a time you had to push back on an unrealistic deadline.",
+            "How do you approach debugging an issue you have never seen before?",
+            "Why are you interested in specialising in the Salesforce platform?"
+        ], 2)
+        lines = [f"{i}. {q}" for i, q in enumerate(technical, 1)]
+        lines += ["", "Soft Skills Questions:"]
+        lines += [f"{i}. {q}" for i, q in enumerate(soft, 1)]
+        return "\n".join(lines)
+
+    def _evaluation(self, rng):
+        level = rng.choice(["Junior", "Mid", "Senior"])
+        return json.dumps({
+            "recommendation": rng.choice(["Hire", "No Hire", "Strong Hire"]),
+            "technical_level": level,
+            "technical_assessment": {
+                "Overall technical level": level,
+                "Strengths": "Solid understanding of Apex and bulkification",
+                "Areas of concern": "Limited exposure to asynchronous processing",
+                "Specific technical skills": "Apex, SOQL, Flows"
+            },
+            "soft_skills_assessment": {
+                "Communication quality": "Clear and structured",
+                "Problem-solving approach": "Methodical",
+                "Motivation and enthusiasm": "High",
+                "Teamwork indicators": "Mentions pairing and code reviews"
+            },
+            "interview_focus_areas": {
+                "Technical topics": "Integration patterns, LWC",
+                "Behavioral questions": "Handling conflicting priorities",
+                "Red flags": "None observed"
+            }
+        })
+
+    def _comparison(self, rng):
+        return json.dumps({
+            "work_experience": ["End date of the most recent role differs by %d months" % rng.randint(1, 9)],
+            "technical_skills": ["LWC listed only in the second CV"],
+            "education": [],
+            "projects": ["CPQ project described with different team sizes"],
+            "red_flags": ["Overlapping employment dates"],
+            "summary": {
+                "overall_assessment": "The second CV is more detailed but less consistent",
+                "key_areas": ["Employment dates", "Skill levels"],
+                "recommendations": ["Clarify the timeline of the last two roles"]
+            }
+        })
+
+    def _comparison_questions(self, rng):
+        questions = [
+            {"question": "Can you clarify when your most recent role ended?",
+             "category": "work_experience", "priority": "high",
+             "context": "End dates differ between CV versions"},
+            {"question": "How much hands-on LWC work have you done?",
+             "category": "skills", "priority": "medium",
+             "context": "LWC appears in only one CV"},
+            {"question": "What was your exact role on the CPQ project?",
+             "category": "projects", "priority": rng.choice(["medium", "low"]),
+             "context": "Project described differently"}
+        ]
+        return json.dumps(questions)
+
+    def _unknown(self, rng):
+        return json.dumps({"result": "ok"})
+
+
+class FakeBackend:
+    def __init__(self, fake: FakeLLM):
+        self.fake = fake
+
+    def client(self):
+        return _Namespace(self._create)
+
+    def async_client(self):
+        return _Namespace(self._acreate)
+
+    def _create(self, **kwargs):
+        content, latency, prompt_tokens = self.fake.respond(kwargs)
+        _wait(latency, kwargs)
+        if kwargs.get("stream"):
+            return _build_chunks(kwargs.get("model"), content, prompt_tokens if _include_usage(kwargs) else None)
+        return _build_completion(kwargs.get("model"), content, prompt_tokens)
+
+    async def _acreate(self, **kwargs):
+        content, latency, prompt_tokens = self.fake.respond(kwargs)
+        await asyncio.sleep(latency)
+        return _build_completion(kwargs.get("model"), content, prompt_tokens)
+
+
+class Cassette:
+    """JSON-lines file of recorded request/response pairs, keyed like the response cache"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def load(self):
+        if self._entries is None:
+            entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries[entry["key"]] = entry
+            self._entries = entries
+        return self._entries
+
+    def get(self, key):
+        return self.load().get(key)
+
+    def record(self, kwargs, content, latency, usage_tokens):
+        entry = {
+            "key": _request_key(kwargs),
+            "model": kwargs.get("model"),
+            "max_tokens": kwargs.get("max_tokens"),
+            "temperature": kwargs.get("temperature"),
+            "messages": kwargs.get("messages"),
+            "content": content,
+            "latency_ms": round(latency * 1000, 1),
+            "total_tokens": usage_tokens
+        }
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # One write per line keeps appends from several workers intact
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            if self._entries is not None:
+                self._entries[entry["key"]] = entry
+
+
+class RecordingBackend:
+    """Calls the real provider and appends every successful exchange to the cassette"""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def client(self):
+        return _Namespace(self._create)
+
+    def async_client(self):
+        return _Namespace(self._acreate)
+
+    def _create(self, **kwargs):
+        started = time.monotonic()
+        response = get_openai_client().chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._record_stream(kwargs, response, started)
+        self._record(kwargs, response, started)
+        return response
+
+    async def _acreate(self, **kwargs):
+        started = time.monotonic()
+        response = await get_async_openai_client().chat.completions.create(**kwargs)
+        self._record(kwargs, response, started)
+        return response
+
+    def _record(self, kwargs, response, started):
+        usage = getattr(response, "usage", None)
+        self.cassette.record(kwargs, response.choices[0].message.content, time.monotonic() - started,
+                             getattr(usage, "total_tokens", None))
+
+    def _record_stream(self, kwargs, stream, started):
+        parts = []
+        usage_tokens = None
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            if getattr(chunk, "usage", None) is not None:
+                usage_tokens = chunk.usage.total_tokens
+            yield chunk
+        self.cassette.record(kwargs, "".join(parts), time.monotonic() - started, usage_tokens)
+
+
+class ReplayBackend:
+    """Answers from the cassette only; optionally sleeps for the recorded latency"""
+
+    def __init__(self, cassette: Cassette, replay_latency: bool):
+        self.cassette = cassette
+        self.replay_latency = replay_latency
+
+    def client(self):
+        return _Namespace(self._create)
+
+    def async_client(self):
+        return _Namespace(self._acreate)
+
+    def _lookup(self, kwargs):
+        entry = self.cassette.get(_request_key(kwargs))
+        if entry is None:
+            raise LLMRequestError(f"No recorded response in {self.cassette.path} for this request")
+        latency = entry.get("latency_ms", 0) / 1000 if self.replay_latency else 0.0
+        return entry, latency
+
+    def _create(self, **kwargs):
+        entry, latency = self._lookup(kwargs)
+        _wait(latency, kwargs)
+        if kwargs.get("stream"):
+            return _build_chunks(entry["model"], entry["content"], 0 if _include_usage(kwargs) else None)
+        return _build_completion(entry["model"], entry["content"], 0)
+
+    async def _acreate(self, **kwargs):
+        entry, latency = self._lookup(kwargs)
+        await asyncio.sleep(latency)
+        return _build_completion(entry["model"], entry["content"], 0)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_llm_backend():
+    """The backend selected by settings.LLM_BACKEND, None for the real provider"""
+    global _backend
+    if _backend is not None:
+        return _backend
+    if settings.LLM_BACKEND == "openai":
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.LLM_BACKEND == "fake":
+                    _backend = FakeBackend(FakeLLM(settings.LLM_FAKE_LATENCY_DISTRIBUTION,
+                                                   settings.LLM_FAKE_LATENCY_MEAN_MS,
+                                                   settings.LLM_FAKE_LATENCY_STDDEV_MS))
+                elif settings.LLM_BACKEND == "record":
+                    _backend = RecordingBackend(Cassette(settings.LLM_CASSETTE_PATH))
+                elif settings.LLM_BACKEND == "replay":
+                    _backend = ReplayBackend(Cassette(settings.LLM_CASSETTE_PATH), settings.LLM_REPLAY_LATENCY)
+                else:
+                    raise ValueError(f"Unknown LLM_BACKEND {settings.LLM_BACKEND!r}, expected one of {BACKENDS}")
+    return _backend
+
+
+def set_llm_backend(backend):
+    """Swap the backend at runtime (e.g. a FakeBackend with custom latency in a benchmark)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def get_llm_client():
+    backend = get_llm_backend()
+    return backend.client() if backend is not None else get_openai_client()
+
+
+def get_async_llm_client():
+    backend = get_llm_backend()
+    return backend.async_client() if backend is not None else get_async_openai_client()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import redis
+
+from app_config import settings
+from utils.redis_client import get_redis, redis_available, mark_redis_down
+from utils.metrics import LLM_CACHE_LOOKUPS, LLM_CACHE_BYTES, LLM_CACHE_LOCAL_BYTES, LLM_CACHE_EVICTIONS
+
+
+def make_cache_key(model, system_prompt, user_prompt, max_tokens, temperature):
+    """Content-addressed key for a chat completion request"""
+    raw = json.dumps([model, system_prompt, user_prompt, max_tokens, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUResponseCache:
+    """In-process tier, evicts least recently used entries once max_bytes is exceeded"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old.encode("utf-8"))
+
+            self._items[key] = value
+            self.current_bytes += size
+
+            evictions = 0
+            while self.current_bytes > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self.current_bytes -= len(evicted.encode("utf-8"))
+                evictions += 1
+            LLM_CACHE_LOCAL_BYTES.set(self.current_bytes)
+        if evictions:
+            LLM_CACHE_EVICTIONS.inc(evictions)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+            LLM_CACHE_LOCAL_BYTES.set(0)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class RedisResponseCache:
+    """Shared tier, entries expire after ttl_seconds"""
+
+    def __init__(self, ttl_seconds: int, prefix: str = "llm_cache:", name: str = "LLMCache"):
+        self.ttl = ttl_seconds
+        self.prefix = prefix
+        self.name = name
+
+    def _get_client(self):
+        return get_redis() if redis_available() else None
+
+    def _mark_down(self, error):
+        mark_redis_down(error, self.name)
+
+    def get(self, key: str):
+        client = self._get_client()
+        if client is None:
+            return None
+        try:
+            return client.get(self.prefix + key)
+        except redis.exceptions.RedisError as e:
+            self._mark_down(e)
+            return None
+
+    def set(self, key: str, value: str):
+        client = self._get_client()
+        if client is None:
+            return
+        try:
+            client.setex(self.prefix + key, self.ttl, value)
+        except redis.exceptions.RedisError as e:
+            self._mark_down(e)
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for chat completions: a process-local LRU in front of Redis.
+    Lookups and bytes served/stored are counted per calling service on /metrics.
+    """
+
+    def __init__(self, local: LRUResponseCache = None, shared: RedisResponseCache = None):
+        self.local = local
+        self.shared = shared
+
+    @staticmethod
+    def _record(service: str, result: str, size: int = 0):
+        service = service or "unknown"
+        if result != "store":
+            LLM_CACHE_LOOKUPS.inc(service=service, result=result)
+        if size:
+            LLM_CACHE_BYTES.inc(size, service=service, direction="stored" if result == "store" else "served")
+
+    def get(self, key: str, service: str = None):
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                self._record(service, "local_hit", len(value.encode("utf-8")))
+                return value
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                if self.local is not None:
+                    self.local.set(key, value)
+                self._record(service, "shared_hit", len(value.encode("utf-8")))
+                return value
+
+        self._record(service, "miss")
+        return None
+
+    def set(self, key: str, value: str, service: str = None):
+        if not value or value.startswith("Error:"):
+            return
+
+        if self.local is not None:
+            self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+        self._record(service, "store", len(value.encode("utf-8")))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide response cache built from settings, None when caching is disabled"""
+    global _cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache(
+                    local=LRUResponseCache(settings.LLM_CACHE_MAX_BYTES),
+                    shared=RedisResponseCache(settings.LLM_CACHE_TTL_SECONDS) if settings.LLM_CACHE_USE_REDIS else None
+                )
+    return _cache
+
+
+def set_llm_cache(cache):
+    """Replace the process-wide cache (e.g. with a custom tier setup)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+import openai
+
+from app_config import settings
+from utils.metrics import OPENAI_HTTP_REQUESTS, OPENAI_POOL_CONNECTIONS
+
+_lock = threading.Lock()
+_client = None
+_http_client = None
+_owner_pid = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _publish_pool():
+    """Connections of the shared sync pool, as /metrics gauges"""
+    # httpx does not expose pool state publicly, read httpcore's pool defensively
+    pool = getattr(getattr(_http_client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for conn in connections if conn.is_idle())
+    OPENAI_POOL_CONNECTIONS.set(len(connections) - idle, state="active")
+    OPENAI_POOL_CONNECTIONS.set(idle, state="idle")
+
+
+def _on_request(request):
+    OPENAI_HTTP_REQUESTS.inc(client="sync")
+
+
+def _on_response(response):
+    _publish_pool()
+
+
+async def _on_async_request(request):
+    OPENAI_HTTP_REQUESTS.inc(client="async")
+
+
+def _pool_options():
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        "timeout": httpx.Timeout(settings.OPENAI_TIMEOUT_SECONDS, connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS)
+    }
+
+
+def _build_http_client():
+    return httpx.Client(event_hooks={"request": [_on_request], "response": [_on_response]},
+                        **_pool_options())
+
+
+def get_openai_client():
+    """
+    Process-wide OpenAI client sharing one keep-alive httpx pool between all services.
+    Rebuilt in a forked child (gunicorn/Celery prefork) so sockets are never shared across processes.
+    """
+    global _client, _http_client, _owner_pid
+    pid = os.getpid()
+    if _client is None or _owner_pid != pid:
+        with _lock:
+            if _client is None or _owner_pid != pid:
+                _http_client = _build_http_client()
+                _client = openai.OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    http_client=_http_client,
+                    max_retries=settings.OPENAI_MAX_RETRIES
+                )
+                _owner_pid = pid
+    return _client
+
+
+def get_async_openai_client():
+    """
+    AsyncOpenAI client for the running event loop. httpx async pools are bound
+    to the loop that created them, so there is one per loop rather than per process.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            event_hooks={"request": [_on_async_request]},
+            **_pool_options()
+        )
+        client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=http_client,
+            max_retries=settings.OPENAI_MAX_RETRIES
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _reset_after_fork():
+    global _lock, _client, _http_client, _owner_pid, _async_clients
+    _lock = threading.Lock()
+    _async_clients = weakref.WeakKeyDictionary()
+    _client = None
+    _http_client = None
+    _owner_pid = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,20 +1,33 @@
 from prompts.quiz_prompts import quiz_prompt, quiz_system_prompt
-from services.base_service import BaseOpenAIService
+from services.base_service import BaseOpenAIService, AsyncBaseOpenAIService
 
 
-class QuizGenerator(BaseOpenAIService):
+class QuizGenerator(BaseOpenAIService, AsyncBaseOpenAIService):
     
-    def generate_quiz(self, cv_text):
+    def generate_quiz(self, cv_text, deadline=None):
         """
         Generate technical quiz and soft skills questions based on CV
         """
-        user_prompt = quiz_prompt(cv_text)
-        result = self.chat(system_prompt=quiz_system_prompt(),
-                           user_prompt=user_prompt,
-                           model="gpt-3.5-turbo",
-                           max_tokens=800,
-                           temperature=0.4)
+        result = self.chat(**self._quiz_request(cv_text), deadline=deadline)
+        return self._build_quiz(result)
 
+    async def agenerate_quiz(self, cv_text):
+        """
+        Awaitable version of generate_quiz
+        """
+        result = await self.achat(**self._quiz_request(cv_text))
+        return self._build_quiz(result)
+
+    def _quiz_request(self, cv_text):
+        return {
+            "system_prompt": quiz_system_prompt(),
+            "user_prompt": quiz_prompt(cv_text),
+            "model": "gpt-3.5-turbo",
+            "max_tokens": 800,
+            "temperature": 0.4
+        }
+
+    def _build_quiz(self, result):
         if result.startswith("Error"):
             return {
                 "technical_questions": [f"Error generating quiz: {result}"],
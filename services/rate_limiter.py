@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+
+import redis
+
+from app_config import settings
+from utils.redis_client import get_redis, redis_available, mark_redis_down
+from utils.metrics import RATE_LIMIT_BUCKET_LEVEL, RATE_LIMIT_WAIT, RATE_LIMIT_SHED
+from services.exceptions import LLMRateLimitError
+
+# Refills every bucket from Redis server time, then takes `cost` from all of them
+# or from none. Returns the wait until all buckets could pay, followed by the levels.
+# ARGV: ttl, then (capacity, refill_per_second, cost) per key.
+TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local ttl = tonumber(ARGV[1])
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    local cost = math.min(tonumber(ARGV[i * 3 + 1]), capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if cost > tokens then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+local result = {tostring(wait)}
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - math.min(tonumber(ARGV[i * 3 + 1]), tonumber(ARGV[i * 3 - 1]))
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', key, ttl)
+    result[i + 1] = tostring(tokens)
+end
+return result
+"""
+
+
+def estimate_tokens(system_prompt: str, user_prompt: str, max_tokens: int) -> int:
+    """Rough prompt size (~4 chars per token) plus the completion budget"""
+    return (len(system_prompt) + len(user_prompt)) // 4 + max_tokens
+
+
+class TokenBucketRateLimiter:
+    """
+    Cluster-wide requests-per-minute and tokens-per-minute buckets per model, kept in Redis
+    so every gunicorn and Celery worker draws from the same budget.
+    Callers wait for capacity up to max_wait seconds and are shed with LLMRateLimitError after that.
+    Fails open when Redis is unreachable.
+    """
+
+    def __init__(self, limits: dict, max_wait: float, prefix: str = "ratelimit:"):
+        self.limits = limits
+        self.max_wait = max_wait
+        self.prefix = prefix
+        self._script = None
+
+    def _get_client(self):
+        if not redis_available():
+            return None
+        client = get_redis()
+        if self._script is None:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        return client
+
+    def _mark_down(self, error):
+        # Not limiting until Redis is back
+        mark_redis_down(error, "RateLimiter")
+
+    def _keys(self, model):
+        return [f"{self.prefix}{model}:requests", f"{self.prefix}{model}:tokens"]
+
+    def _take(self, model, tokens):
+        """One atomic attempt; returns seconds to wait (0 when granted)"""
+        limit = self.limits.get(model)
+        if not limit or self._get_client() is None:
+            return 0.0
+
+        rpm, tpm = limit["rpm"], limit["tpm"]
+        try:
+            result = self._script(keys=self._keys(model),
+                                  args=[120, rpm, rpm / 60, 1, tpm, tpm / 60, tokens])
+        except redis.exceptions.RedisError as e:
+            self._mark_down(e)
+            return 0.0
+
+        RATE_LIMIT_BUCKET_LEVEL.set(float(result[1]), model=model, bucket="requests")
+        RATE_LIMIT_BUCKET_LEVEL.set(float(result[2]), model=model, bucket="tokens")
+        return float(result[0])
+
+    def _record(self, model, waited, shed=False):
+        RATE_LIMIT_WAIT.observe(waited, model=model, outcome="shed" if shed else "acquired")
+        if shed:
+            RATE_LIMIT_SHED.inc(model=model)
+
+    def _next_step(self, model, wait, waited):
+        """How long to sleep before retrying, raising once max_wait would be exceeded"""
+        if waited + wait > self.max_wait:
+            self._record(model, waited, shed=True)
+            raise LLMRateLimitError(f"Local rate limit for {model} reached, shedding request",
+                                    retry_after=wait)
+        return wait
+
+    def acquire(self, model: str, tokens: int):
+        waited = 0.0
+        while True:
+            wait = self._take(model, tokens)
+            if wait <= 0:
+                self._record(model, waited)
+                return waited
+            delay = self._next_step(model, wait, waited)
+            time.sleep(delay)
+            waited += delay
+
+    async def aacquire(self, model: str, tokens: int):
+        """acquire() for the event loop; Redis calls run in a thread so a slow Redis blocks only this caller"""
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self._take, model, tokens)
+            if wait <= 0:
+                self._record(model, waited)
+                return waited
+            delay = self._next_step(model, wait, waited)
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def settle(self, model: str, estimated: int, actual: int):
+        """Refund (or charge) the difference between estimated and real token usage"""
+        client = self._get_client() if model in self.limits and actual else None
+        if client is None:
+            return
+        try:
+            client.hincrbyfloat(self._keys(model)[1], "tokens", estimated - actual)
+        except redis.exceptions.RedisError as e:
+            self._mark_down(e)
+
+    async def asettle(self, model: str, estimated: int, actual: int):
+        await asyncio.to_thread(self.settle, model, estimated, actual)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Process-wide limiter, None when rate limiting is disabled"""
+    global _limiter
+    if not settings.LLM_RATE_LIMIT_ENABLED:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = TokenBucketRateLimiter(settings.LLM_RATE_LIMITS, settings.LLM_RATE_LIMIT_MAX_WAIT_SECONDS)
+    return _limiter
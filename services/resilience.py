@@ -0,0 +1,216 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import openai
+
+from app_config import settings
+from services.exceptions import (
+    LLMError,
+    LLMRequestError,
+    LLMUnavailableError,
+    LLMRateLimitError,
+    LLMTimeoutError,
+    CircuitOpenError
+)
+
+
+def parse_retry_after(exc):
+    """Seconds the provider asked us to wait, from Retry-After(-Ms) headers"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def classify_error(exc):
+    """Map an OpenAI/httpx exception to a typed LLMError"""
+    if isinstance(exc, LLMError):
+        return exc
+
+    message = str(exc)
+    if isinstance(exc, openai.RateLimitError):
+        if getattr(exc, "code", None) == "insufficient_quota":
+            return LLMRequestError(message)
+        return LLMRateLimitError(message, parse_retry_after(exc))
+    if isinstance(exc, (openai.APITimeoutError, asyncio.TimeoutError, TimeoutError)):
+        return LLMTimeoutError(message or "LLM request timed out")
+    if isinstance(exc, openai.APIConnectionError):
+        return LLMUnavailableError(message)
+    if isinstance(exc, openai.APIStatusError):
+        if exc.status_code in (408, 409) or exc.status_code >= 500:
+            return LLMUnavailableError(message, parse_retry_after(exc))
+        return LLMRequestError(message)
+    return LLMRequestError(message)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive provider failures.
+    While open every call fails fast; after reset_timeout one trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError or let the call through; True when it is the half-open trial"""
+        with self._lock:
+            if self.state == "closed":
+                return False
+
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+                self._trial_in_flight = False
+
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            raise CircuitOpenError(self.name, retry_after=max(remaining, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def abort_trial(self):
+        """The trial ended without an outcome (cancelled, timed out), let the next call try"""
+        with self._lock:
+            if self.state == "half_open":
+                self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"[LLM] Circuit for {self.name} opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        return {"state": self.state, "failures": self.failures}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(model):
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(model, settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                                     settings.LLM_CIRCUIT_RESET_SECONDS)
+            _breakers[model] = breaker
+        return breaker
+
+
+def circuit_states():
+    with _breakers_lock:
+        return {model: breaker.snapshot() for model, breaker in _breakers.items()}
+
+
+def _backoff_delay(attempt, error):
+    """Full-jitter exponential backoff, or the provider's Retry-After when given"""
+    if error.retry_after is not None:
+        return error.retry_after
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY_SECONDS, settings.LLM_RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def _handle_failure(breaker, exc, attempt):
+    """Classify a failed attempt; return the delay before the next one or raise"""
+    error = classify_error(exc)
+    if not isinstance(error, LLMUnavailableError):
+        # The provider answered, so it is healthy even though the request was bad
+        breaker.record_success()
+        raise error from exc
+
+    breaker.record_failure()
+    delay = _backoff_delay(attempt, error)
+    last_attempt = attempt + 1 >= settings.LLM_RETRY_MAX_ATTEMPTS
+    # Waiting longer than our own cap only piles up blocked workers, fail instead
+    if last_attempt or delay > settings.LLM_RETRY_MAX_DELAY_SECONDS:
+        raise error from exc
+    return delay
+
+
+def call_with_resilience(model, fn, deadline=None):
+    """
+    Run fn() with retries and the model's circuit breaker, raising typed LLMErrors.
+    With a deadline (time.monotonic()) no retry is started that would begin after it.
+    """
+    breaker = get_circuit_breaker(model)
+    attempt = 0
+    while True:
+        trial = breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            delay = _handle_failure(breaker, e, attempt)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise classify_error(e) from e
+            time.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            # e.g. eventlet.Timeout, which would otherwise hold the trial slot forever
+            if trial:
+                breaker.abort_trial()
+            raise
+        breaker.record_success()
+        return result
+
+
+async def acall_with_resilience(model, coro_fn):
+    """Async counterpart of call_with_resilience; coro_fn returns a fresh awaitable per attempt"""
+    breaker = get_circuit_breaker(model)
+    attempt = 0
+    while True:
+        trial = breaker.before_call()
+        try:
+            result = await coro_fn()
+        except asyncio.CancelledError:
+            if trial:
+                breaker.abort_trial()
+            raise
+        except Exception as e:
+            delay = _handle_failure(breaker, e, attempt)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
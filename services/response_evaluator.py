@@ -1,21 +1,89 @@
 import json
+
+import jiter
+
 from prompts.evaluation_prompts import build_response_evaluation_prompt, response_evaluation_system_prompt
-from services.base_service import BaseOpenAIService
+from services.base_service import BaseOpenAIService, AsyncBaseOpenAIService
+from services.exceptions import LLMRequestError
+
+STREAMED_SECTIONS = ("recommendation", "technical_assessment", "soft_skills_assessment")
 
 
-class ResponseEvaluator(BaseOpenAIService):
+class ResponseEvaluator(BaseOpenAIService, AsyncBaseOpenAIService):
     
     def evaluate_responses(self, cv_text, quiz, responses):
         """
         Evaluate candidate responses and provide recommendations
         """
-        user_prompt = build_response_evaluation_prompt(cv_text, quiz, responses)
-        result = self.chat(system_prompt=response_evaluation_system_prompt(),
-                           user_prompt=user_prompt,
-                           model="gpt-4",
-                           max_tokens=1500,
-                           temperature=0.3)
+        result = self.chat(**self._evaluation_request(cv_text, quiz, responses))
+        return self._normalize(result)
+
+    async def aevaluate_responses(self, cv_text, quiz, responses):
+        """
+        Awaitable version of evaluate_responses
+        """
+        result = await self.achat(**self._evaluation_request(cv_text, quiz, responses))
+        return self._normalize(result)
+
+    def _evaluation_request(self, cv_text, quiz, responses):
+        return {
+            "system_prompt": response_evaluation_system_prompt(),
+            "user_prompt": build_response_evaluation_prompt(cv_text, quiz, responses),
+            "model": "gpt-4",
+            "max_tokens": 1500,
+            "temperature": 0.3
+        }
+
+    def stream_evaluation(self, cv_text, quiz, responses):
+        """
+        Stream the evaluation, yielding (section, value) as soon as each of
+        STREAMED_SECTIONS is fully generated, then ("result", normalized evaluation).
+        LLMUnavailableError propagates, a half-written evaluation is never stored.
+        """
+        parts = []
+        emitted = set()
+
+        try:
+            for delta in self.chat_stream(**self._evaluation_request(cv_text, quiz, responses)):
+                parts.append(delta)
+                # A section can only have closed on a structural character
+                if not any(ch in delta for ch in ',}]"'):
+                    continue
+                for section, value in self._completed_sections("".join(parts), final=False):
+                    if section not in emitted:
+                        emitted.add(section)
+                        yield section, value
+        except LLMRequestError as e:
+            yield "result", self._normalize(f"Error: {str(e)}")
+            return
+
+        result = "".join(parts)
+        for section, value in self._completed_sections(result, final=True):
+            if section not in emitted:
+                emitted.add(section)
+                yield section, value
+
+        yield "result", self._normalize(result)
+
+    def _completed_sections(self, text, final):
+        start = text.find("{")
+        if start == -1:
+            return []
+        try:
+            partial = jiter.from_json(text[start:].encode("utf-8"), partial_mode=True)
+        except ValueError:
+            return []
+        if not isinstance(partial, dict):
+            return []
+
+        # Keys arrive in order, so every key but the last is complete. Partial mode
+        # drops unterminated strings, so a string value present is complete too.
+        keys = list(partial.keys())
+        if keys and not final and not isinstance(partial[keys[-1]], str):
+            keys = keys[:-1]
+        return [(key, partial[key]) for key in keys if key in STREAMED_SECTIONS]
 
+    def _normalize(self, result):
         if result.startswith("Error:"):
             return {
                 "error": result,
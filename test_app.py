@@ -7,8 +7,23 @@ Run this before starting the main application.
 import os
 import sys
 import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 
+@contextmanager
+def fake_redis():
+    """Point the shared Redis client at an in-process fakeredis, restored afterwards"""
+    import fakeredis
+    from utils import redis_client
+
+    saved = redis_client._client, redis_client._down_until
+    redis_client._client = fakeredis.FakeRedis(decode_responses=True)
+    redis_client._down_until = 0.0
+    try:
+        yield redis_client._client
+    finally:
+        redis_client._client, redis_client._down_until = saved
+
 def test_imports():
     """Test that all required modules can be imported"""
     print("Testing imports...")
@@ -135,6 +150,400 @@ def test_env_file():
         print("  FLASK_ENV=development")
         return False
 
+def test_circuit_breaker():
+    """Test circuit breaker state transitions"""
+    print("\nTesting circuit breaker...")
+
+    import time
+    from services.exceptions import CircuitOpenError
+    from services.resilience import CircuitBreaker
+
+    breaker = CircuitBreaker("test-model", failure_threshold=2, reset_timeout=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "closed", "opened before the failure threshold"
+    breaker.record_failure()
+    assert breaker.state == "open", "still closed at the failure threshold"
+    try:
+        breaker.before_call()
+        assert False, "open circuit let a call through"
+    except CircuitOpenError:
+        pass
+    print("✓ Opens after consecutive failures and fails fast")
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    try:
+        breaker.before_call()
+        assert False, "half-open circuit let a second trial through"
+    except CircuitOpenError:
+        pass
+    breaker.record_failure()
+    assert breaker.state == "open", "failed trial did not re-open the circuit"
+    print("✓ Lets one trial through after the reset timeout, re-opens when it fails")
+
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.snapshot() == {"state": "closed", "failures": 0}
+    print("✓ Closes after a successful trial")
+    return True
+
+def test_circuit_breaker_cancelled_trial():
+    """Test that a half-open trial cancelled mid-call frees the trial slot"""
+    print("\nTesting cancelled circuit breaker trials...")
+
+    import asyncio
+    import time
+    import uuid
+    from services.resilience import acall_with_resilience, call_with_resilience, get_circuit_breaker
+
+    def reopen(model):
+        breaker = get_circuit_breaker(model)
+        breaker.state = "open"
+        breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+        return breaker
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def ok():
+        return "ok"
+
+    model = f"test-{uuid.uuid4().hex}"
+    breaker = reopen(model)
+    try:
+        asyncio.run(asyncio.wait_for(acall_with_resilience(model, slow), 0.05))
+        assert False, "slow trial was not cancelled"
+    except asyncio.TimeoutError:
+        pass
+    assert asyncio.run(acall_with_resilience(model, ok)) == "ok"
+    assert breaker.state == "closed"
+    print("✓ Cancelled async trial lets the next call close the circuit")
+
+    class Interrupted(BaseException):
+        pass
+
+    def interrupted():
+        raise Interrupted()
+
+    reopen(model)
+    try:
+        call_with_resilience(model, interrupted)
+        assert False, "BaseException was swallowed"
+    except Interrupted:
+        pass
+    assert call_with_resilience(model, lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+    print("✓ Trial interrupted by a BaseException frees the slot")
+    return True
+
+def test_stream_evaluation():
+    """Test that streamed evaluation sections are emitted once, in order and complete"""
+    print("\nTesting streamed evaluation...")
+
+    import json
+    from services import llm_backends
+    from services.response_evaluator import ResponseEvaluator, STREAMED_SECTIONS
+
+    saved = llm_backends._backend
+    llm_backends.set_llm_backend(llm_backends.FakeBackend(llm_backends.FakeLLM("fixed", 0, 0)))
+    try:
+        evaluator = ResponseEvaluator()
+        evaluator.cache = None
+        evaluator.rate_limiter = None
+        stream = evaluator.chat_stream
+        received = []
+
+        def counting_stream(**kwargs):
+            for delta in stream(**kwargs):
+                received.append(delta)
+                yield delta
+
+        evaluator.chat_stream = counting_stream
+        events = [(section, value, len(received))
+                  for section, value in evaluator.stream_evaluation("CV text", {"technical_questions": ["Q1"]},
+                                                                    {"q1": "A"})]
+    finally:
+        llm_backends.set_llm_backend(saved)
+
+    content = "".join(received)
+    expected = json.loads(content)
+    assert [section for section, _, _ in events] == list(STREAMED_SECTIONS) + ["result"], events
+    for section, value, _ in events[:-1]:
+        assert value == expected[section], section
+    assert events[0][2] < len(received), "first section was only emitted at the end of the stream"
+    print("✓ Sections emitted once, in order, with complete values, before the stream ends")
+
+    assert events[-1][1] == evaluator._normalize(content)
+    print("✓ Normalized result emitted last")
+
+    # Last key of the object and a string cut mid-value: only the final pass may emit them
+    text = '{"technical_level": "Mid", "recommendation": "Strong Hire"'
+    assert evaluator._completed_sections(text[:-5], final=False) == []
+    assert evaluator._completed_sections(text[:-2] + "}", final=False) == []
+    assert evaluator._completed_sections(text + ', "soft_skills_assessment": {"a": "b"',
+                                         final=False) == [("recommendation", "Strong Hire")]
+    assert evaluator._completed_sections(text + ', "soft_skills_assessment": {"a": "b"}}', final=True) == [
+        ("recommendation", "Strong Hire"), ("soft_skills_assessment", {"a": "b"})]
+    print("✓ Unterminated strings and the last open value wait for the final pass")
+    return True
+
+def test_rate_limit_shedding():
+    """Test that the token bucket sheds requests it can't serve within max_wait"""
+    print("\nTesting rate limiter...")
+
+    import uuid
+    from services.exceptions import LLMRateLimitError
+    from services.rate_limiter import TokenBucketRateLimiter
+
+    with fake_redis():
+        limiter = TokenBucketRateLimiter({"test-model": {"rpm": 2, "tpm": 100000}}, max_wait=0.1,
+                                         prefix=f"test-ratelimit:{uuid.uuid4().hex}:")
+        assert limiter.acquire("test-model", 100) == 0.0
+        assert limiter.acquire("test-model", 100) == 0.0
+        print("✓ Requests within the budget are granted without waiting")
+
+        try:
+            limiter.acquire("test-model", 100)
+            assert False, "request over the budget was not shed"
+        except LLMRateLimitError as e:
+            # The next request slot refills in 30s at 2 rpm
+            assert e.retry_after > 0.1
+        print("✓ Requests that would wait past max_wait are shed")
+
+        assert limiter.acquire("unlimited-model", 100) == 0.0
+        print("✓ Models without limits are not throttled")
+    return True
+
+def test_docx_tables():
+    """Test that DOCX extraction keeps tables in document order"""
+    print("\nTesting DOCX extraction...")
+
+    import docx
+    from utils.file_processor import FileProcessor
+
+    document = docx.Document()
+    document.add_paragraph("Jane Doe")
+    table = document.add_table(rows=2, cols=2)
+    for row, values in zip(table.rows, [("Skill", "Years"), ("Apex", "6")]):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    document.add_paragraph("Education: BSc")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cv.docx")
+        document.save(path)
+        text = FileProcessor().extract_text(path)
+
+    assert text == "Jane Doe\nSkill | Years\nApex | 6\nEducation: BSc\n", repr(text)
+    print("✓ Table rows extracted between the surrounding paragraphs")
+    return True
+
+def test_blob_eviction():
+    """Test that upload eviction spares referenced and recent blobs"""
+    print("\nTesting upload eviction...")
+
+    import time
+    from utils.blob_store import BlobStore
+
+    now = time.time()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore(tmp)
+        expired = store.put_bytes(b"expired", ".txt")
+        referenced = store.put_bytes(b"referenced", ".txt")
+        over_quota = store.put_bytes(b"over quota", ".txt")
+        recent = store.put_bytes(b"recent", ".txt")
+        for path, age in ((expired, 40 * 86400), (referenced, 40 * 86400), (over_quota, 3600), (recent, 60)):
+            os.utime(path, (now - age, now - age))
+
+        result = store.evict(max_bytes=1, retention_seconds=30 * 86400, referenced={referenced},
+                             min_age_seconds=600)
+        remaining = {path for path, _, _ in store.iter_files()}
+
+    assert remaining == {referenced, recent}, remaining
+    assert result["removed"]["files"] == 2
+    print("✓ Expired and over-quota blobs removed")
+    print("✓ Referenced blobs and blobs younger than min_age kept")
+    return True
+
+def test_memory_store():
+    """Test the fallback memory store's LRU byte bound and TTL heap"""
+    print("\nTesting memory store...")
+
+    import time
+    from utils.memory_store import MemoryStore
+
+    store = MemoryStore(max_bytes=30, sweep_interval=3600)
+    for key in ("a", "b", "c"):
+        store.set(key, b"x" * 10, 60)
+    assert store.get("a") == b"x" * 10
+    store.set("d", b"x" * 10, 60)
+    assert "b" not in store and all(key in store for key in ("a", "c", "d"))
+    assert store.current_bytes == 30
+    print("✓ Least recently used entries evicted past max_bytes")
+
+    store.set("a", b"x" * 31, 60)
+    assert "a" not in store and store.stats()["rejected"] == 1
+    assert store.current_bytes == 20
+    print("✓ Oversized payloads rejected, dropping the old value")
+
+    store = MemoryStore(max_bytes=1024, sweep_interval=3600)
+    store.set("overwritten", b"old", 0.01)
+    store.set("overwritten", b"new", 60)
+    store.set("expiring", b"value", 0.01)
+    time.sleep(0.02)
+    assert store.sweep() == 1
+    assert store.get("overwritten") == b"new" and "expiring" not in store
+    print("✓ Sweep removes expired entries and skips stale heap entries")
+
+    for _ in range(200):
+        store.set("overwritten", b"new", 60)
+    assert store.stats()["heap_size"] <= 2 * len(store) + 64
+    print("✓ Heap compacted after repeated overwrites")
+    return True
+
+def test_evaluation_store_layouts():
+    """Test EvaluationStore hash and blob layouts, and reading one from the other"""
+    print("\nTesting EvaluationStore layouts...")
+
+    import json
+    import uuid
+    from utils.storage import EvaluationStore
+
+    record = {"first_name": "Jane", "quiz": {"technical_questions": ["Q1"]}, "responses": {}}
+    with fake_redis() as r:
+        hashes = EvaluationStore(ttl_seconds=60, use_hashes=True)
+        key = f"test:{uuid.uuid4().hex}"
+        hashes.set(key, record)
+        assert r.type(key) == "hash"
+        assert hashes.get(key) == record
+        assert hashes.get_fields(key, ("first_name", "missing")) == {"first_name": "Jane"}
+        hashes.update(key, {"responses": {"q1": "A"}})
+        assert hashes.get(key) == {**record, "responses": {"q1": "A"}}
+        assert 0 < r.ttl(key) <= 60
+        print("✓ Hash records read and updated field by field")
+
+        blobs = EvaluationStore(ttl_seconds=60, use_hashes=False)
+        blob_key = f"test:{uuid.uuid4().hex}"
+        blobs.set(blob_key, record)
+        assert r.type(blob_key) == "string"
+        assert blobs.get(blob_key) == record
+        assert blobs.get_fields(blob_key, ("quiz",)) == {"quiz": record["quiz"]}
+        assert hashes.get(blob_key) == record and blobs.get(key)["responses"] == {"q1": "A"}
+        print("✓ Blob records readable in either mode")
+
+        legacy_key = f"test:{uuid.uuid4().hex}"
+        r.setex(legacy_key, 60, json.dumps(record))
+        assert hashes.get_fields(legacy_key, ("first_name",)) == {"first_name": "Jane"}
+        hashes.update(legacy_key, {"first_name": "John"})
+        assert r.type(legacy_key) == "hash"
+        assert hashes.get(legacy_key) == {**record, "first_name": "John"}
+        print("✓ Legacy JSON records upgraded to hashes on update")
+
+        for k in (key, blob_key, legacy_key):
+            hashes.delete(k)
+            assert not hashes.exists(k)
+        assert hashes.get_fields(key, ("first_name",)) is None
+        print("✓ Deleted records are gone")
+    return True
+
+def test_codec():
+    """Test codec round trips and decoding of values written before codecs existed"""
+    print("\nTesting codec...")
+
+    import json
+    from utils.codec import Codec, MAGIC
+
+    small = {"first_name": "Jane", "skills": ["Apex", "LWC"], "score": 7.5}
+    large = {"cv_text": "Salesforce Developer with 6 years of experience. " * 200}
+    for serializer in ("json", "msgpack"):
+        for compression in ("none", "zlib", "zstd"):
+            codec = Codec(serializer=serializer, compression=compression, min_compress_bytes=1024)
+            # Both packages are in requirements.txt, a silent fallback to json/zlib is a failure
+            assert (codec.serializer, codec.compression) == (serializer, compression), \
+                f"{serializer}/{compression} fell back to {codec.serializer}/{codec.compression}"
+            for value in (small, large):
+                assert codec.decode(codec.encode(value)) == value, (serializer, compression)
+    print("✓ Round trips for every serializer and compressor")
+
+    codec = Codec(serializer="json", compression="zlib", min_compress_bytes=1024)
+    assert codec.encode(small)[0] != MAGIC, "small JSON values should stay plain"
+    encoded = codec.encode(large)
+    assert encoded[0] == MAGIC and len(encoded) < len(json.dumps(large))
+    print("✓ Only values past min_compress_bytes are compressed")
+
+    legacy = json.dumps(small)
+    assert codec.decode(legacy) == small
+    assert codec.decode(legacy.encode("utf-8")) == small
+    print("✓ Plain JSON written before codecs still decodes")
+
+    try:
+        codec.decode(bytes((MAGIC, 99, 1)) + b"{}")
+        assert False, "unknown codec version decoded"
+    except ValueError:
+        pass
+    print("✓ Unknown codec versions are rejected")
+    return True
+
+def test_evaluation_store_fallback():
+    """Test the Redis-less fallback: untouched while Redis is up, used during and after an outage"""
+    print("\nTesting EvaluationStore fallback...")
+
+    import uuid
+    from utils import redis_client
+    from utils.sqlite_store import SQLiteStore
+    from utils.storage import EvaluationStore, FallbackStore
+
+    with fake_redis() as r, tempfile.TemporaryDirectory() as tmp:
+        store = EvaluationStore(ttl_seconds=60, use_hashes=True)
+        store._fallback = FallbackStore()
+        store._fallback._store = SQLiteStore(os.path.join(tmp, "sessions.sqlite3"), 1024 * 1024, 60)
+
+        key = f"test:{uuid.uuid4().hex}"
+        store.set(key, {"first_name": "Jane"})
+        store.delete(key)
+        assert store._fallback.store is None, "healthy Redis touched the fallback"
+        print("✓ Fallback untouched while Redis is up")
+
+        redis_client.mark_redis_down(ConnectionError("test outage"), "Test")
+        outage_key = f"test:{uuid.uuid4().hex}"
+        store.set(outage_key, {"first_name": "Jane", "responses": {}})
+        assert not r.exists(outage_key)
+        assert store.get_fields(outage_key, ("first_name",)) == {"first_name": "Jane"}
+        assert store.exists(outage_key)
+        print("✓ Sessions kept in the fallback during an outage")
+
+        redis_client._down_until = 0.0
+        assert store.get(outage_key) == {"first_name": "Jane", "responses": {}}
+        store.update(outage_key, {"responses": {"q1": "A"}})
+        assert r.type(outage_key) == "hash"
+        assert store._fallback._store.get(outage_key) is None
+        assert store.get(outage_key) == {"first_name": "Jane", "responses": {"q1": "A"}}
+        print("✓ Sessions from the outage read back and moved to Redis on update")
+    return True
+
+def test_session_l1_fill_after_clear():
+    """Test that the L1 cache rejects fills that started before clear()"""
+    print("\nTesting session L1 cache...")
+
+    from utils.session_cache import SessionL1Cache
+
+    cache = SessionL1Cache(max_entries=10, ttl_seconds=60)
+    cache.invalidate("session", publish=False)
+    token = cache.begin_fill()
+    cache.clear()
+    cache.fill("session", {"first_name": "Jane"}, True, token)
+    assert cache.get("session") is None, "fill from before clear() was cached"
+    print("✓ Fills started before a clear are dropped, also for keys invalidated earlier")
+
+    token = cache.begin_fill()
+    cache.fill("session", {"first_name": "Jane"}, True, token)
+    assert cache.get("session") == {"first_name": "Jane"}
+    print("✓ Fills started after the clear are cached")
+    return True
+
 def main():
     """Run all tests"""
     print("HR CV Analysis System - Test Suite")
@@ -146,14 +555,30 @@ def main():
         test_services,
         test_utils,
         test_directories,
-        test_env_file
+        test_env_file,
+        test_circuit_breaker,
+        test_circuit_breaker_cancelled_trial,
+        test_stream_evaluation,
+        test_rate_limit_shedding,
+        test_docx_tables,
+        test_blob_eviction,
+        test_memory_store,
+        test_evaluation_store_layouts,
+        test_codec,
+        test_evaluation_store_fallback,
+        test_session_l1_fill_after_clear
     ]
     
     passed = 0
     total = len(tests)
     
     for test in tests:
-        if test():
+        try:
+            ok = test()
+        except (AssertionError, ImportError) as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+        if ok:
             passed += 1
     
     print("\n" + "=" * 40)
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import time
+import uuid
+
+
+class BlobStore:
+    """
+    Uploads stored once per distinct content under <root>/blobs/<aa>/<sha256><ext>.
+    A blob's mtime is refreshed whenever the same bytes are uploaded again, so
+    retention counts from the last upload rather than the first.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+
+    def blob_path(self, digest, ext):
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}{ext.lower()}")
+
+    def _commit(self, tmp_path, digest, ext):
+        path = self.blob_path(digest, ext)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return path
+
+    def _tmp_path(self):
+        os.makedirs(self.blob_dir, exist_ok=True)
+        return os.path.join(self.blob_dir, f".{uuid.uuid4().hex}.tmp")
+
+    def put_bytes(self, content: bytes, ext: str):
+        """Store content, returning the path of its blob"""
+        tmp_path = self._tmp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        return self._commit(tmp_path, hashlib.sha256(content).hexdigest(), ext)
+
+    def put_stream(self, stream, ext: str):
+        """Store a binary stream, hashing it while it is copied to disk"""
+        digest = hashlib.sha256()
+        tmp_path = self._tmp_path()
+        with open(tmp_path, "wb") as f:
+            for block in iter(lambda: stream.read(1024 * 1024), b""):
+                digest.update(block)
+                f.write(block)
+        return self._commit(tmp_path, digest.hexdigest(), ext)
+
+    def iter_files(self):
+        """(path, size, mtime) of every blob plus legacy {session_id}_{name} uploads in the root"""
+        roots = [(self.root, False), (self.blob_dir, True)]
+        for directory, recursive in roots:
+            if not os.path.isdir(directory):
+                continue
+            for root, dirs, files in os.walk(directory):
+                if not recursive:
+                    dirs[:] = []
+                for name in files:
+                    if name.startswith("."):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def usage(self):
+        files = list(self.iter_files())
+        return {"files": len(files), "bytes": sum(size for _, size, _ in files)}
+
+    def evict(self, max_bytes: int, retention_seconds: int, referenced: set, min_age_seconds: int = 0):
+        """
+        Delete files older than retention_seconds, then the oldest files until the
+        total is under max_bytes. Paths in referenced and files younger than
+        min_age_seconds are never deleted.
+        """
+        now = time.time()
+        referenced = {os.path.abspath(path) for path in referenced if path}
+        files = sorted(self.iter_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        removed = {"files": 0, "bytes": 0}
+
+        for path, size, mtime in files:
+            expired = now - mtime > retention_seconds
+            if not expired and total <= max_bytes:
+                continue
+            if now - mtime < min_age_seconds or os.path.abspath(path) in referenced:
+                continue
+            try:
+                # Re-uploaded since the scan started
+                if os.stat(path).st_mtime != mtime:
+                    continue
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed["files"] += 1
+            removed["bytes"] += size
+
+        self._remove_stale_tmp_files(now)
+        self._remove_empty_dirs()
+        return {"removed": removed, "remaining_bytes": total}
+
+    def _remove_stale_tmp_files(self, now, max_age_seconds=3600):
+        """Leftovers of writes interrupted by a crash"""
+        if not os.path.isdir(self.blob_dir):
+            return
+        for name in os.listdir(self.blob_dir):
+            if not name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.blob_dir, name)
+            try:
+                if now - os.stat(path).st_mtime > max_age_seconds:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _remove_empty_dirs(self):
+        if not os.path.isdir(self.blob_dir):
+            return
+        for name in os.listdir(self.blob_dir):
+            path = os.path.join(self.blob_dir, name)
+            if os.path.isdir(path):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    pass
@@ -0,0 +1,142 @@
+import json
+import zlib
+
+from app_config import settings
+
+# Encoded values start with MAGIC, a format version and one byte holding the
+# serializer (low nibble) and compressor (high nibble). Values without the header
+# are the plain JSON text EvaluationStore wrote before codecs existed; JSON can't
+# start with 0xC5, so both stay readable.
+MAGIC = 0xC5
+VERSION = 1
+
+SERIALIZERS = {"json": 1, "msgpack": 2}
+COMPRESSORS = {"none": 0, "zlib": 1, "zstd": 2}
+
+
+def _load_orjson():
+    try:
+        import orjson
+        return orjson
+    except ImportError:
+        return None
+
+
+def _load_msgpack():
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        return None
+
+
+def _load_zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+class Codec:
+    """
+    Turns session values into bytes for Redis and back. Payloads of at least
+    min_compress_bytes are compressed, smaller ones only serialized; plain JSON
+    below the threshold is written without a header. JSON goes through orjson
+    when it is installed.
+    """
+
+    def __init__(self, serializer: str = "json", compression: str = "zlib", min_compress_bytes: int = 1024,
+                 level: int = 6):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown serializer: {serializer}")
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown compression: {compression}")
+
+        self._orjson = _load_orjson()
+        self._msgpack = _load_msgpack()
+        self._zstd = _load_zstd()
+        if serializer == "msgpack" and self._msgpack is None:
+            print("[Codec] msgpack is not installed, serializing as JSON")
+            serializer = "json"
+        if compression == "zstd" and self._zstd is None:
+            print("[Codec] zstandard is not installed, compressing with zlib")
+            compression = "zlib"
+
+        self.serializer = serializer
+        self.compression = compression
+        self.min_compress_bytes = min_compress_bytes
+        self.level = level
+        if compression == "zstd":
+            self._zstd_compressor = self._zstd.ZstdCompressor(level=level)
+
+    def _serialize(self, value):
+        if self.serializer == "msgpack":
+            return self._msgpack.packb(value, use_bin_type=True)
+        if self._orjson is not None:
+            try:
+                return self._orjson.dumps(value)
+            except TypeError:
+                # e.g. non-string dict keys, which json.dumps converts
+                pass
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def _loads_json(self, raw):
+        if self._orjson is not None:
+            return self._orjson.loads(raw)
+        return json.loads(raw)
+
+    def _compress(self, body):
+        if self.compression == "zlib":
+            return zlib.compress(body, self.level)
+        return self._zstd_compressor.compress(body)
+
+    def encode(self, value) -> bytes:
+        body = self._serialize(value)
+        compression = self.compression if len(body) >= self.min_compress_bytes else "none"
+        if compression == "none" and self.serializer == "json":
+            return body
+        if compression != "none":
+            body = self._compress(body)
+        flags = SERIALIZERS[self.serializer] | COMPRESSORS[compression] << 4
+        return bytes((MAGIC, VERSION, flags)) + body
+
+    def decode(self, raw):
+        if isinstance(raw, str) or not raw or raw[0] != MAGIC:
+            return self._loads_json(raw)
+
+        version, flags = raw[1], raw[2]
+        if version != VERSION:
+            raise ValueError(f"Unsupported codec version {version}")
+        body = raw[3:]
+
+        compressor = flags >> 4
+        if compressor == COMPRESSORS["zlib"]:
+            body = zlib.decompress(body)
+        elif compressor == COMPRESSORS["zstd"]:
+            if self._zstd is None:
+                raise ValueError("Value is zstd compressed but zstandard is not installed")
+            body = self._zstd.ZstdDecompressor().decompress(body)
+
+        serializer = flags & 0x0F
+        if serializer == SERIALIZERS["msgpack"]:
+            if self._msgpack is None:
+                raise ValueError("Value is msgpack encoded but msgpack is not installed")
+            return self._msgpack.unpackb(body, raw=False)
+        return self._loads_json(body)
+
+
+_codec = None
+
+
+def get_codec():
+    """Process-wide codec built from the EVALUATION_STORE_* settings"""
+    global _codec
+    if _codec is None:
+        _codec = Codec(
+            serializer=settings.EVALUATION_STORE_SERIALIZER,
+            compression=settings.EVALUATION_STORE_COMPRESSION,
+            min_compress_bytes=settings.EVALUATION_STORE_COMPRESS_MIN_BYTES,
+            level=settings.EVALUATION_STORE_COMPRESSION_LEVEL
+        )
+    return _codec
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+
+from app_config import settings
+from services.llm_cache import RedisResponseCache
+from utils.metrics import EXTRACTION_CACHE_LOOKUPS
+
+
+def make_extraction_key(digest: str, extension: str, version: str):
+    """
+    Key for the text of a file with this sha256. The PDF budget is part of the key
+    because it changes the extracted text.
+    """
+    raw = f"{version}:{extension}:{settings.PDF_MAX_PAGES}:{settings.PDF_MAX_CHARS}:{digest}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskTextCache:
+    """
+    Text files under directory, shared by every worker on the host.
+    Once the total size exceeds max_bytes the least recently read files are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read()
+            # mtime doubles as last access time for eviction
+            os.utime(path)
+            return value
+        except OSError:
+            return None
+
+    def set(self, key: str, value: str):
+        data = value.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[ExtractionCache] Could not write {path}: {e}")
+            return
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._scan_size()
+            else:
+                self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Rescan (other processes write here too) and trim to 90% of max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                continue
+        self._bytes = total
+
+
+class ExtractionCache:
+    """Extracted CV text by content hash: the host's disk tier in front of Redis"""
+
+    def __init__(self, disk: DiskTextCache = None, shared: RedisResponseCache = None):
+        self.disk = disk
+        self.shared = shared
+
+    def get(self, key: str):
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                EXTRACTION_CACHE_LOOKUPS.inc(result="disk_hit")
+                return value
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                if self.disk is not None:
+                    self.disk.set(key, value)
+                EXTRACTION_CACHE_LOOKUPS.inc(result="redis_hit")
+                return value
+
+        EXTRACTION_CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    def set(self, key: str, value: str):
+        if self.disk is not None:
+            self.disk.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+
+def _default_directory():
+    upload_folder = os.path.abspath(settings.UPLOAD_FOLDER)
+    return os.path.join(os.path.dirname(upload_folder), "extraction_cache")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Process-wide extraction cache built from settings, None when disabled"""
+    global _cache
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                shared = None
+                if settings.EXTRACTION_CACHE_USE_REDIS:
+                    shared = RedisResponseCache(settings.EXTRACTION_CACHE_TTL_SECONDS, prefix="extract:",
+                                                name="ExtractionCache")
+                _cache = ExtractionCache(
+                    disk=DiskTextCache(settings.EXTRACTION_CACHE_DIR or _default_directory(),
+                                       settings.EXTRACTION_CACHE_MAX_BYTES),
+                    shared=shared
+                )
+    return _cache
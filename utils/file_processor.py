@@ -1,13 +1,175 @@
+import hashlib
+import io
+import multiprocessing
 import os
+import threading
+import time
 import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from lxml import etree
 from werkzeug.utils import secure_filename
 from app_config import settings
+from utils.blob_store import BlobStore
+from utils.extraction_cache import get_extraction_cache, make_extraction_key
+
+# Bump whenever a change to extraction alters the text, so cached results are not reused
+EXTRACTOR_VERSION = "2"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_DOCX_BLOCKS = [f"{_W}{tag}" for tag in ("p", "tc", "tr", "tbl")]
+# Run-level elements and what they contribute; None means the element's own text
+_DOCX_TEXT = {f"{_W}t": None, f"{_W}tab": "\t", f"{_W}br": "\n", f"{_W}cr": "\n"}
+
+_pdf_pool = None
+_pdf_pool_pid = None
+_pdf_pool_lock = threading.Lock()
+# How long past the deadline a worker may take to hand back its pages before it counts as stuck
+_PDF_WORKER_GRACE_SECONDS = 1.0
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def _iter_reader_pages(reader, start, stop):
+    pages = reader.pages
+    stop = len(pages) if stop is None else min(stop, len(pages))
+    for index in range(start, stop):
+        yield pages[index].extract_text() or ""
+
+
+def iter_pdf_pages(source, start=0, stop=None):
+    """Yield the text of pages [start, stop) one at a time; source is a path, bytes or binary stream"""
+    import PyPDF2
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    yield from _iter_reader_pages(PyPDF2.PdfReader(source), start, stop)
+
+
+def _extract_pdf_page_range(source, start, stop, deadline=None):
+    """
+    Process pool entry point, must stay importable at module level. Stops after
+    the page during which deadline (time.time()) passed, so fewer pages than
+    stop - start means the range was cut short.
+    """
+    pages = []
+    for page_text in iter_pdf_pages(source, start, stop):
+        pages.append(page_text)
+        if deadline is not None and time.time() > deadline:
+            break
+    return pages
+
+
+def _paragraph_text(paragraph):
+    parts = []
+    for elem in paragraph.iter(*_DOCX_TEXT):
+        text = _DOCX_TEXT[elem.tag]
+        if text is None:
+            text = elem.text or ""
+        parts.append(text)
+    return "".join(parts)
+
+
+def iter_docx_blocks(source):
+    """
+    Yield the body of a DOCX in document order: one string per paragraph and one
+    " | " joined string per table row. Streams word/document.xml with iterparse and
+    drops each element once read, so memory stays flat on large documents.
+    """
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml:
+        tables = []  # per open table: [cells of the current row, paragraphs of the current cell]
+        for event, elem in etree.iterparse(xml, events=("start", "end"), tag=_DOCX_BLOCKS):
+            tag = elem.tag[len(_W):]
+            if event == "start":
+                if tag == "tbl":
+                    tables.append([[], []])
+                elif tag == "tc" and tables:
+                    tables[-1][1] = []
+                continue
+
+            if tag == "p":
+                text = _paragraph_text(elem)
+                if not tables:
+                    yield text
+                elif text.strip():
+                    tables[-1][1].append(text.strip())
+            elif tag == "tc" and tables:
+                tables[-1][0].append(" ".join(tables[-1][1]))
+            elif tag == "tr" and tables:
+                row = " | ".join(cell for cell in tables[-1][0] if cell)
+                tables[-1][0] = []
+                if row:
+                    # A table nested in a cell becomes part of that cell
+                    if len(tables) > 1:
+                        tables[-2][1].append(row)
+                    else:
+                        yield row
+            elif tag == "tbl" and tables:
+                tables.pop()
+
+            if tag in ("p", "tbl"):
+                elem.clear(keep_tail=True)
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+
+def _get_pdf_pool():
+    global _pdf_pool, _pdf_pool_pid
+    pid = os.getpid()
+    if _pdf_pool is None or _pdf_pool_pid != pid:
+        with _pdf_pool_lock:
+            if _pdf_pool is None or _pdf_pool_pid != pid:
+                # spawn, because forking a threaded web worker can deadlock the children
+                _pdf_pool = ProcessPoolExecutor(max_workers=settings.PDF_PROCESS_POOL_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+                _pdf_pool_pid = pid
+    return _pdf_pool
+
+
+def _recycle_pdf_pool(pool):
+    """
+    Kill the workers of a pool with a task stuck past its deadline; the next caller
+    builds a new one. Cancelling a running task does nothing, and a worker left on a
+    pathological page would keep its slot forever. Tasks of other requests still in
+    the pool fail with BrokenProcessPool.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_writer():
+    global _writer, _writer_pid
+    pid = os.getpid()
+    if _writer is None or _writer_pid != pid:
+        with _writer_lock:
+            if _writer is None or _writer_pid != pid:
+                _writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-writer")
+                _writer_pid = pid
+    return _writer
+
+
+def _write_blob(blob_store, content, ext):
+    try:
+        blob_store.put_bytes(content, ext)
+    except OSError as e:
+        print(f"[FileProcessor] Could not persist upload: {e}")
+
+
+def _describe(source):
+    return source if isinstance(source, (str, os.PathLike)) else "<in-memory upload>"
 
 
 class FileProcessor:
     def __init__(self):
         self.upload_folder = settings.UPLOAD_FOLDER
         self.allowed_extensions = settings.ALLOWED_EXTENSIONS
+        self.blob_store = BlobStore(self.upload_folder)
     
     def allowed_file(self, filename):
         """Check if file extension is allowed"""
@@ -15,68 +177,201 @@ class FileProcessor:
                filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
     
     def save_file(self, file, session_id):
-        """Save uploaded file and return file path"""
+        """Save uploaded file in the blob store and return its path; identical files share one blob"""
         if file and self.allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Add session ID to filename to avoid conflicts
-            name, ext = os.path.splitext(filename)
-            filename = f"{session_id}_{name}{ext}"
-            
-            file_path = os.path.join(self.upload_folder, filename)
-            file.save(file_path)
-            return file_path
+            ext = os.path.splitext(secure_filename(file.filename))[1]
+            return self.blob_store.put_stream(file.stream, ext)
         else:
             raise ValueError("Invalid file type")
     
+    def read_upload(self, file):
+        """Validate an upload and return (content, extension) straight from the request stream"""
+        if not (file and self.allowed_file(file.filename)):
+            raise ValueError("Invalid file type")
+        return file.read(), '.' + file.filename.rsplit('.', 1)[1].lower()
+
+    def persist_upload(self, content, filename, session_id):
+        """
+        Keep the original upload in the blob store, in the background when
+        PERSIST_UPLOADS_ASYNC is set. Returns the blob path, or None when PERSIST_UPLOADS is off.
+        """
+        if not settings.PERSIST_UPLOADS:
+            return None
+
+        ext = os.path.splitext(secure_filename(filename))[1]
+        if settings.PERSIST_UPLOADS_ASYNC:
+            # The path only depends on the content, so it is known before the write
+            _get_writer().submit(_write_blob, self.blob_store, content, ext)
+            return self.blob_store.blob_path(hashlib.sha256(content).hexdigest(), ext)
+        return self.blob_store.put_bytes(content, ext)
+
+    def file_digest(self, file_path):
+        """sha256 of the file contents"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def extract_text_cached(self, file_path):
+        """extract_text, answered from the extraction cache when the same bytes were seen before"""
+        if not settings.EXTRACTION_CACHE_ENABLED:
+            return self.extract_text(file_path)
+        file_ext = os.path.splitext(file_path)[1].lower()
+        return self._cached(self.file_digest(file_path), file_ext, lambda: self.extract_text(file_path))
+
+    def extract_upload(self, content, file_ext):
+        """Text of an upload held in memory, through the extraction cache"""
+        extract = lambda: self._extract(io.BytesIO(content), file_ext)
+        if not settings.EXTRACTION_CACHE_ENABLED:
+            return extract()
+        return self._cached(hashlib.sha256(content).hexdigest(), file_ext, extract)
+
+    def _cached(self, digest, file_ext, extract):
+        cache = get_extraction_cache()
+        key = make_extraction_key(digest, file_ext, EXTRACTOR_VERSION)
+        text = cache.get(key)
+        if text is not None:
+            return text
+
+        started = time.monotonic()
+        text = extract()
+        # Error strings and PDFs cut short by the timeout must be extracted again next time
+        timed_out = time.monotonic() - started >= settings.PDF_EXTRACT_TIMEOUT_SECONDS
+        if not timed_out and not self.is_extraction_error(text):
+            cache.set(key, text)
+        return text
+
+    def is_extraction_error(self, text):
+        """Extractors report failures as text, tell those apart from a CV"""
+        return text.startswith("Error extracting") or "text extraction requires" in text
+
     def extract_text(self, file_path):
         """Extract text from uploaded file"""
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
+        return self._extract(file_path, os.path.splitext(file_path)[1].lower())
+
+    def _extract(self, source, file_ext):
+        """source is a path or a binary file-like object"""
         if file_ext == '.txt':
-            return self._extract_from_txt(file_path)
+            return self._extract_from_txt(source)
         elif file_ext == '.pdf':
-            return self._extract_from_pdf(file_path)
+            return self._extract_from_pdf(source)
         elif file_ext in ['.doc', '.docx']:
-            return self._extract_from_doc(file_path)
+            return self._extract_from_doc(source)
         else:
             raise ValueError(f"Unsupported file type: {file_ext}")
     
-    def _extract_from_txt(self, file_path):
+    def _extract_from_txt(self, source):
         """Extract text from TXT file"""
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                raw = file.read()
+        else:
+            raw = source.read()
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+            text = raw.decode('utf-8')
         except UnicodeDecodeError:
             # Try with different encoding
-            with open(file_path, 'r', encoding='latin-1') as file:
-                return file.read()
+            text = raw.decode('latin-1')
+        # Same newlines as reading the file in text mode
+        return text.replace('\r\n', '\n').replace('\r', '\n')
     
-    def _extract_from_pdf(self, file_path):
-        """Extract text from PDF file"""
+    def _extract_from_pdf(self, source):
+        """
+        Extract text from PDF file, at most PDF_MAX_PAGES pages and PDF_MAX_CHARS
+        characters. With the process pool enabled every file is extracted there,
+        split into page ranges when large. Past PDF_EXTRACT_TIMEOUT_SECONDS the
+        pages extracted so far are returned. Without the pool pages are read in
+        this thread and the timeout is only checked between pages, so one
+        pathological page can still overrun it.
+        """
         try:
             import PyPDF2
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
+            reader = PyPDF2.PdfReader(source)
+            page_count = min(len(reader.pages), settings.PDF_MAX_PAGES)
+            deadline = time.monotonic() + settings.PDF_EXTRACT_TIMEOUT_SECONDS
+
+            if settings.PDF_PROCESS_POOL_WORKERS > 0:
+                pages = self._extract_pdf_pages_pooled(source, page_count, deadline)
+            else:
+                pages = self._extract_pdf_pages_serial(reader, page_count, deadline, _describe(source))
+
+            if not pages and time.monotonic() > deadline:
+                raise TimeoutError(f"no page extracted within {settings.PDF_EXTRACT_TIMEOUT_SECONDS}s")
+            return self._join_pages(pages)
         except ImportError:
             # Fallback to basic text extraction
             return "PDF text extraction requires PyPDF2. Please install it with: pip install PyPDF2"
         except Exception as e:
             return f"Error extracting PDF text: {str(e)}"
-    
-    def _extract_from_doc(self, file_path):
-        """Extract text from DOC/DOCX file"""
+
+    def _extract_pdf_pages_serial(self, reader, page_count, deadline, label):
+        pages = []
+        chars = 0
+        for page_text in _iter_reader_pages(reader, 0, page_count):
+            pages.append(page_text)
+            chars += len(page_text) + 1
+            if chars >= settings.PDF_MAX_CHARS:
+                break
+            if time.monotonic() > deadline:
+                print(f"[FileProcessor] PDF extraction timed out after {len(pages)} pages: {label}")
+                break
+        return pages
+
+    def _extract_pdf_pages_pooled(self, source, page_count, deadline):
+        """
+        Extract in worker processes, as one page range or, from PDF_PARALLEL_MIN_PAGES
+        pages, one range per worker. Keeps the in-order prefix that finished in time;
+        workers still busy after the deadline get the pool recycled.
+        """
+        pool = _get_pdf_pool()
+        label = _describe(source)
+        source = self._picklable(source)
+        ranges = settings.PDF_PROCESS_POOL_WORKERS if page_count >= settings.PDF_PARALLEL_MIN_PAGES else 1
+        chunk = max(1, -(-page_count // ranges))
+        remaining = max(0.0, deadline - time.monotonic())
+        worker_deadline = time.time() + remaining
+        bounds = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+        futures = [pool.submit(_extract_pdf_page_range, source, start, stop, worker_deadline)
+                   for start, stop in bounds]
+
+        done, not_done = wait(futures, timeout=remaining + _PDF_WORKER_GRACE_SECONDS)
+        if not_done:
+            print(f"[FileProcessor] PDF extraction stuck with {len(not_done)} page ranges pending, "
+                  f"restarting the PDF pool: {label}")
+            _recycle_pdf_pool(pool)
+
+        pages = []
+        for future, (start, stop) in zip(futures, bounds):
+            if future not in done:
+                break
+            try:
+                chunk_pages = future.result()
+            except BrokenProcessPool:
+                # Another request's stuck page took the pool down with this one
+                if not pages:
+                    raise
+                break
+            pages.extend(chunk_pages)
+            if len(chunk_pages) < stop - start:
+                print(f"[FileProcessor] PDF extraction timed out after {len(pages)} pages: {label}")
+                break
+        return pages
+
+    def _picklable(self, source):
+        # Workers get a path or the raw bytes, streams can't be pickled
+        if isinstance(source, (str, os.PathLike, bytes)):
+            return source
+        source.seek(0)
+        return source.read()
+
+    def _join_pages(self, pages):
+        text = "\n".join(pages) + "\n" if pages else ""
+        return text[:settings.PDF_MAX_CHARS]
+
+    def _extract_from_doc(self, source):
+        """Extract text from DOCX file, paragraphs and table rows in document order"""
         try:
-            import docx
-            doc = docx.Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-        except ImportError:
-            return "DOC/DOCX text extraction requires python-docx. Please install it with: pip install python-docx"
+            return "".join(f"{block}\n" for block in iter_docx_blocks(source))
         except Exception as e:
             return f"Error extracting DOC text: {str(e)}"
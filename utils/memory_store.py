@@ -0,0 +1,158 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import FALLBACK_STORE_ENTRIES, FALLBACK_STORE_BYTES, FALLBACK_STORE_REMOVALS
+
+
+class MemoryStore:
+    """
+    Encoded values with a TTL, for EvaluationStore while Redis is down.
+    Expiry goes through a min-heap of (expire_at, key), so removing expired
+    entries costs O(log n) each and is done by a background sweeper rather than
+    on requests. Beyond max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes: int, sweep_interval: float):
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.current_bytes = 0
+        self._items = OrderedDict()
+        self._heap = []
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "rejected": 0}
+
+    def get(self, key: str):
+        """The payload, or None when missing or expired"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] <= time.time():
+                self._discard(key)
+                self._count("expired")
+                item = None
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self._stats["hits"] += 1
+            return item[1]
+
+    def set(self, key: str, payload: bytes, ttl_seconds: float):
+        size = len(payload)
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                self._stats["rejected"] += 1
+                print(f"[MemoryStore] {key} ({size} bytes) exceeds the {self.max_bytes} byte limit, not stored")
+                self._publish()
+                return
+
+            expire_at = time.time() + ttl_seconds
+            self._items[key] = (expire_at, payload)
+            self.current_bytes += size
+            heapq.heappush(self._heap, (expire_at, key))
+
+            evicted = 0
+            while self.current_bytes > self.max_bytes:
+                self._discard(next(iter(self._items)))
+                evicted += 1
+            if evicted:
+                self._count("evicted", evicted)
+            self._compact_heap()
+            self._publish()
+
+        if self._sweeper is None:
+            self._start_sweeper()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._discard(key)
+            self._publish()
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            return item is not None and item[0] > time.time()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _discard(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.current_bytes -= len(item[1])
+
+    def _count(self, reason, amount=1):
+        self._stats[reason] += amount
+        FALLBACK_STORE_REMOVALS.inc(amount, reason=reason)
+
+    def _compact_heap(self):
+        # Overwritten and deleted keys leave stale heap entries behind
+        if len(self._heap) > 2 * len(self._items) + 64:
+            self._heap = [(item[0], key) for key, item in self._items.items()]
+            heapq.heapify(self._heap)
+
+    def _publish(self):
+        FALLBACK_STORE_ENTRIES.set(len(self._items))
+        FALLBACK_STORE_BYTES.set(self.current_bytes)
+
+    def sweep(self, batch_size=1000):
+        """Drop every expired entry, returns how many were removed"""
+        now = time.time()
+        removed = 0
+        done = False
+        while not done:
+            # The lock is released between batches so requests aren't held up
+            with self._lock:
+                batch = 0
+                for _ in range(batch_size):
+                    if not self._heap or self._heap[0][0] > now:
+                        done = True
+                        break
+                    expire_at, key = heapq.heappop(self._heap)
+                    item = self._items.get(key)
+                    # Skip entries for keys that were overwritten or deleted since
+                    if item is not None and item[0] == expire_at:
+                        self._discard(key)
+                        batch += 1
+                else:
+                    done = not self._heap
+                if batch:
+                    self._count("expired", batch)
+                    removed += batch
+                self._publish()
+        if removed:
+            print(f"[MemoryStore] Removed {removed} expired entries.")
+        return removed
+
+    def _start_sweeper(self):
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="memory-store-sweep", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[MemoryStore] Error during sweep: {str(e)}")
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._items),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "heap_size": len(self._heap)
+            }
+
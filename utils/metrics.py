@@ -0,0 +1,558 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import redis
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from app_config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, float("inf"))
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, float("inf"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms for this process. Every process periodically
+    writes its totals to <directory>/<pid>-<start>.json and render() merges all of
+    them, so a scrape of any gunicorn worker reports the whole server.
+    Snapshots of processes that are gone have their counters and histograms folded
+    into archive.json and their gauges dropped. clear() empties the directory; it
+    runs at startup in python app.py, gunicorn's on_starting hook (gunicorn.conf.py)
+    and Celery's worker_init.
+    """
+
+    ARCHIVE = "archive.json"
+
+    def __init__(self, directory: str, flush_interval: float):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._set_identity()
+
+    def _set_identity(self):
+        # The start time tells this process apart from an earlier one with the same pid
+        self._pid = os.getpid()
+        self._filename = f"{self._pid}-{time.time_ns()}.json"
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        self._values[metric.name] = {}
+        return metric
+
+    def _update(self, metric, labels, fn):
+        if not settings.METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in metric.labelnames)
+        with self._lock:
+            series = self._values[metric.name]
+            series[key] = fn(series.get(key))
+        if self.directory and self._flusher is None:
+            self._start_flusher()
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _reset_after_fork(self):
+        # A forked worker must not report its parent's numbers a second time
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._set_identity()
+        for series in self._values.values():
+            series.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {name: [[list(key), value] for key, value in series.items()]
+                    for name, series in self._values.items()}
+
+    def flush(self):
+        """Write this process' totals where other workers can read them"""
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, self._filename)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[Metrics] Could not write snapshot: {e}")
+
+    def clear(self):
+        """Remove every snapshot and the archive"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith((".json", ".tmp")):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _snapshot_files(self):
+        """Paths of other processes' snapshots, split into live and dead"""
+        by_pid = {}
+        for filename in os.listdir(self.directory):
+            pid, _, started = filename[:-len(".json")].partition("-")
+            if not filename.endswith(".json") or not pid.isdigit() or not started.isdigit():
+                continue
+            by_pid.setdefault(int(pid), []).append((int(started), filename))
+
+        live, dead = [], []
+        for pid, files in by_pid.items():
+            files.sort()
+            alive = pid != self._pid and _pid_alive(pid)
+            for i, (_, filename) in enumerate(files):
+                if filename == self._filename:
+                    continue
+                # Only the newest snapshot of a live pid is that process, older ones had the pid before it
+                is_live = alive and i == len(files) - 1
+                (live if is_live else dead).append(os.path.join(self.directory, filename))
+        return live, dead
+
+    def _archive(self, dead):
+        """Fold the counters and histograms of dead processes into the archive"""
+        lock_path = os.path.join(self.directory, "archive.lock")
+        try:
+            with open(lock_path, "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                archive_path = os.path.join(self.directory, self.ARCHIVE)
+                merged = self._merge([self._load(archive_path) or {}], kinds=("counter", "histogram"))
+                removed = []
+                for path in dead:
+                    snapshot = self._load(path)
+                    if snapshot is None:
+                        continue
+                    merged = self._merge([self._as_snapshot(merged), snapshot], kinds=("counter", "histogram"))
+                    removed.append(path)
+                tmp_path = f"{archive_path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(self._as_snapshot(merged), f)
+                os.replace(tmp_path, archive_path)
+                for path in removed:
+                    os.remove(path)
+        except OSError as e:
+            print(f"[Metrics] Could not archive snapshots of exited processes: {e}")
+
+    @staticmethod
+    def _as_snapshot(merged):
+        return {name: [[list(key), value] for key, value in series.items()] for name, series in merged.items()}
+
+    def _other_snapshots(self):
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        live, dead = self._snapshot_files()
+        if dead:
+            self._archive(dead)
+        for path in [*live, os.path.join(self.directory, self.ARCHIVE)]:
+            snapshot = self._load(path)
+            if snapshot is not None:
+                yield snapshot
+
+    def _merge(self, snapshots, kinds=None):
+        merged = {name: {} for name in self._metrics}
+        for snapshot in snapshots:
+            for name, series in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (kinds is not None and metric.kind not in kinds):
+                    continue
+                for key, value in series:
+                    key = tuple(key)
+                    merged[name][key] = metric.merge(merged[name].get(key), value)
+        return merged
+
+    def collect(self):
+        """Values per metric and label set, merged over every process"""
+        return self._merge([self.snapshot(), *self._other_snapshots()])
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, series in self.collect().items():
+            metric = self._metrics[name]
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(series.items()):
+                lines.extend(metric.exposition(dict(zip(metric.labelnames, key)), value))
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry._update(self, labels, lambda value: (value or 0) + amount)
+
+    def merge(self, left, right):
+        return (left or 0) + right
+
+    def exposition(self, labels, value):
+        return [f"{self.name}_total{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Gauge:
+    """
+    Current value per process, only reported while the process is alive. With
+    mode="sum" the exposition adds up the processes, with mode="latest" it shows
+    the value set most recently by any of them (for shared state, e.g. in Redis).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), mode: str = "sum", registry=None):
+        if mode not in ("sum", "latest"):
+            raise ValueError(f"Unknown gauge mode: {mode}")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.mode = mode
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    # Stored as [value, time it was set]
+    def set(self, value: float, **labels):
+        self.registry._update(self, labels, lambda _: [value, time.time()])
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry._update(self, labels, lambda state: [(state[0] if state else 0) + amount, time.time()])
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def merge(self, left, right):
+        if left is None:
+            return list(right)
+        if self.mode == "latest":
+            return list(right) if right[1] >= left[1] else left
+        return [left[0] + right[0], max(left[1], right[1])]
+
+    def exposition(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value[0])}"]
+
+
+class Histogram:
+    """Stored as per-bucket counts followed by sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def observe(self, value: float, **labels):
+        def add(state):
+            state = state or [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+            return state
+        self.registry._update(self, labels, add)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def merge(self, left, right):
+        if left is None:
+            return list(right)
+        return [a + b for a, b in zip(left, right)]
+
+    def exposition(self, labels, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            bucket_labels = dict(labels, le=_format_value(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {value[-1]}")
+        return lines
+
+
+REGISTRY = MetricsRegistry(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL_SECONDS)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=REGISTRY._reset_after_fork)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "hr_http_request_duration_seconds", "Flask request latency",
+    ["endpoint", "method", "status"]
+)
+STAGE_DURATION = Histogram(
+    "hr_stage_duration_seconds", "Latency of manager pipeline stages",
+    ["manager", "stage"]
+)
+STAGE_ERRORS = Counter(
+    "hr_stage_errors", "Manager pipeline stages that raised",
+    ["manager", "stage"]
+)
+LLM_REQUEST_DURATION = Histogram(
+    "hr_llm_request_duration_seconds", "Chat completion latency including cache, rate limiting and retries",
+    ["service", "model", "outcome"]
+)
+LLM_TOKENS = Counter(
+    "hr_llm_tokens", "Tokens reported by the provider",
+    ["service", "model"]
+)
+OPENAI_HTTP_REQUESTS = Counter(
+    "hr_openai_http_requests", "HTTP requests sent to the OpenAI API, including SDK retries",
+    ["client"]
+)
+OPENAI_POOL_CONNECTIONS = Gauge(
+    "hr_openai_pool_connections", "Connections in the shared OpenAI httpx pool, updated after every response",
+    ["state"]
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "hr_llm_cache_lookups", "Response cache lookups by the tier that answered (local_hit, shared_hit) or miss",
+    ["service", "result"]
+)
+LLM_CACHE_BYTES = Counter(
+    "hr_llm_cache_bytes", "Completion bytes served from or stored into the response cache",
+    ["service", "direction"]
+)
+LLM_CACHE_LOCAL_BYTES = Gauge(
+    "hr_llm_cache_local_bytes", "Bytes held by the in-process response cache tier"
+)
+LLM_CACHE_EVICTIONS = Counter(
+    "hr_llm_cache_evictions", "Entries evicted from the in-process response cache tier"
+)
+RATE_LIMIT_BUCKET_LEVEL = Gauge(
+    "hr_rate_limit_bucket_level", "Tokens left in a cluster-wide rate limit bucket when last drawn from",
+    ["model", "bucket"], mode="latest"
+)
+RATE_LIMIT_WAIT = Histogram(
+    "hr_rate_limit_wait_seconds", "Time spent waiting for rate limit capacity, by whether the call went ahead",
+    ["model", "outcome"], buckets=(0, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+)
+RATE_LIMIT_SHED = Counter(
+    "hr_rate_limit_shed", "Calls rejected after waiting LLM_RATE_LIMIT_MAX_WAIT_SECONDS for capacity",
+    ["model"]
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "hr_redis_command_duration_seconds", "Redis command round trip",
+    ["command"], buckets=FAST_BUCKETS
+)
+REDIS_ERRORS = Counter(
+    "hr_redis_errors", "Redis commands that raised",
+    ["command"]
+)
+REDIS_POOL_CONNECTIONS = Gauge(
+    "hr_redis_pool_connections", "Connections held by the shared Redis pool",
+    ["state"]
+)
+REDIS_POOL_CONNECTIONS_CREATED = Counter(
+    "hr_redis_pool_connections_created", "Connections opened by the shared Redis pool"
+)
+REDIS_POOL_WAIT = Histogram(
+    "hr_redis_pool_wait_seconds", "Time spent waiting to check a connection out of the shared Redis pool",
+    buckets=FAST_BUCKETS
+)
+REDIS_AVAILABILITY_CHANGES = Counter(
+    "hr_redis_availability_changes", "Redis marked down after a failure, or up again after a health check",
+    ["state"]
+)
+SESSION_L1_LOOKUPS = Counter(
+    "hr_session_l1_lookups", "Session reads answered (hit) or not (miss) by the per-process L1 cache",
+    ["result"]
+)
+SESSION_L1_INVALIDATIONS = Counter(
+    "hr_session_l1_invalidations", "L1 entries dropped for a write made here (local) or received on the channel",
+    ["source"]
+)
+FALLBACK_STORE_ENTRIES = Gauge(
+    "hr_fallback_store_entries", "Sessions held in the in-process fallback store"
+)
+FALLBACK_STORE_BYTES = Gauge(
+    "hr_fallback_store_bytes", "Encoded bytes held in the in-process fallback store"
+)
+FALLBACK_STORE_REMOVALS = Counter(
+    "hr_fallback_store_removals", "Entries dropped from the fallback store",
+    ["reason"]
+)
+DB_QUERY_DURATION = Histogram(
+    "hr_db_query_duration_seconds", "SQLAlchemy statement execution time",
+    ["operation"], buckets=FAST_BUCKETS
+)
+DB_ERRORS = Counter(
+    "hr_db_errors", "SQLAlchemy statements that raised",
+    ["operation"]
+)
+EXTRACTION_CACHE_LOOKUPS = Counter(
+    "hr_extraction_cache_lookups", "Extraction cache lookups by tier that answered",
+    ["result"]
+)
+
+
+@contextmanager
+def track_stage(manager: str, stage: str):
+    """Time one manager stage, counting it as an error when it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(manager=manager, stage=stage)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started, manager=manager, stage=stage)
+
+
+class LLMCallTracker:
+    """Set outcome ("ok", "cached", "error") and tokens while the call runs"""
+
+    def __init__(self, service: str, model: str):
+        self.service = service
+        self.model = model
+        self.outcome = "ok"
+        self.tokens = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A streaming caller closing the generator early is not a failed call
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.outcome = "error"
+        LLM_REQUEST_DURATION.observe(time.perf_counter() - self._started,
+                                     service=self.service, model=self.model, outcome=self.outcome)
+        if self.tokens:
+            LLM_TOKENS.inc(self.tokens, service=self.service, model=self.model)
+        return False
+
+
+def track_llm_call(service: str, model: str):
+    return LLMCallTracker(service, model)
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    """Pipeline whose round trip is timed as one PIPELINE (or MULTI) command"""
+
+    def execute(self, raise_on_error=True):
+        command = "MULTI" if self.transaction else "PIPELINE"
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        except redis.exceptions.RedisError:
+            REDIS_ERRORS.inc(command=command)
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - started, command=command)
+
+
+class InstrumentedRedis(redis.Redis):
+    """redis.Redis that times every command it sends, and pipelines as a whole"""
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+    def execute_command(self, *args, **options):
+        command = str(args[0]).upper() if args else "UNKNOWN"
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        except redis.exceptions.RedisError:
+            REDIS_ERRORS.inc(command=command)
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - started, command=command)
+
+
+def _statement_operation(statement):
+    parts = statement.lstrip().split(None, 1)
+    return parts[0].upper() if parts else "UNKNOWN"
+
+
+def instrument_engine(engine):
+    """Time every statement the SQLAlchemy engine executes"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, operation=_statement_operation(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started_stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if started_stack:
+            started_stack.pop()
+        DB_ERRORS.inc(operation=_statement_operation(context.statement) if context.statement else "CONNECT")
+
+    return engine
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from app_config import settings
+from utils.metrics import (
+    InstrumentedRedis,
+    REDIS_POOL_CONNECTIONS,
+    REDIS_POOL_CONNECTIONS_CREATED,
+    REDIS_POOL_WAIT,
+    REDIS_AVAILABILITY_CHANGES
+)
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """
+    Blocking pool that reports open and checked out connections and the time
+    callers wait for one. Nothing is connected until the first command.
+    """
+
+    def reset(self):
+        # Also runs in a forked child, whose connections all belong to the parent
+        super().reset()
+        self._open = 0
+        self._checked_out = set()
+        self._publish()
+
+    def _publish(self):
+        REDIS_POOL_CONNECTIONS.set(self._open, state="open")
+        REDIS_POOL_CONNECTIONS.set(len(self._checked_out), state="in_use")
+
+    def make_connection(self):
+        connection = super().make_connection()
+        self._open += 1
+        REDIS_POOL_CONNECTIONS_CREATED.inc()
+        self._publish()
+        return connection
+
+    def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        finally:
+            REDIS_POOL_WAIT.observe(time.perf_counter() - started)
+        self._checked_out.add(id(connection))
+        self._publish()
+        return connection
+
+    def release(self, connection):
+        # Also called for connections that failed to connect and were never handed out
+        super().release(connection)
+        self._checked_out.discard(id(connection))
+        self._publish()
+
+    def stats(self):
+        return {"max_connections": self.max_connections, "open": self._open, "in_use": len(self._checked_out)}
+
+
+_client = None
+_client_lock = threading.Lock()
+_down_until = 0.0
+_probe_lock = threading.Lock()
+
+
+def get_redis():
+    """
+    Process-wide client on one connection pool, shared by the evaluation store,
+    the LLM and extraction caches and the rate limiter. Creating it never touches
+    the network; redis-py replaces the pool's connections after a fork.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                pool = InstrumentedConnectionPool(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=0,
+                    decode_responses=True,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+                    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+                    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+                    # One immediate retry replaces a pooled connection that went stale
+                    # (e.g. Redis restarted); beyond that callers fall back on their own
+                    retry=Retry(NoBackoff(), 1)
+                )
+                _client = InstrumentedRedis(connection_pool=pool)
+    return _client
+
+
+def redis_available():
+    """
+    False while Redis is marked down. Once REDIS_RETRY_SECONDS have passed one
+    caller pings it, and every component goes back to Redis when that succeeds.
+    """
+    global _down_until
+    if not _down_until:
+        return True
+    if time.time() < _down_until or not _probe_lock.acquire(blocking=False):
+        return False
+    try:
+        get_redis().ping()
+    except redis.exceptions.RedisError:
+        _down_until = time.time() + settings.REDIS_RETRY_SECONDS
+        return False
+    finally:
+        _probe_lock.release()
+
+    _down_until = 0.0
+    REDIS_AVAILABILITY_CHANGES.inc(state="up")
+    print("[Redis] Reachable again, leaving fallback mode")
+    return True
+
+
+def mark_redis_down(error, component: str):
+    """Called by a component whose Redis command failed"""
+    global _down_until
+    if not _down_until:
+        REDIS_AVAILABILITY_CHANGES.inc(state="down")
+        print(f"[{component}] Redis unavailable, retrying in {settings.REDIS_RETRY_SECONDS}s: {error}")
+    _down_until = time.time() + settings.REDIS_RETRY_SECONDS
+
+
+def redis_pool_stats():
+    return get_redis().connection_pool.stats()
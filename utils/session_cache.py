@@ -0,0 +1,175 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+from app_config import settings
+from utils.metrics import SESSION_L1_LOOKUPS, SESSION_L1_INVALIDATIONS
+from utils.redis_client import get_redis
+
+INVALIDATION_CHANNEL = "evaluation_store:invalidate"
+
+
+class SessionL1Cache:
+    """
+    Small per-process cache of decoded session fields in front of Redis.
+    Every write publishes the key on INVALIDATION_CHANNEL and every process drops
+    it on receipt. The cache is only used while the subscription is live; when it
+    drops the cache is cleared, and ttl_seconds bounds staleness in between.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_tracked_invalidations: int = 10000):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_tracked_invalidations = max_tracked_invalidations
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self._invalidated = OrderedDict()
+        self._invalidated_floor = 0
+        self._listener = None
+        self._connected = False
+
+    @property
+    def active(self):
+        """True while invalidations are being received"""
+        if self._listener is None:
+            self._start_listener()
+        return self._connected
+
+    def begin_fill(self):
+        """Token to pass to fill(); a write seen after it makes that fill a no-op"""
+        with self._lock:
+            return self._last_seq
+
+    def fill(self, key, fields: dict, complete: bool, token):
+        with self._lock:
+            # A write landed while this value was being fetched, it may be stale
+            if max(self._invalidated.get(key, 0), self._invalidated_floor) > token:
+                return
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                entry = (time.time() + self.ttl, {}, False)
+            self._entries[key] = (entry[0], {**entry[1], **fields}, entry[2] or complete)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key):
+        """A copy of the whole record when it is cached complete, else None"""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None or not entry[2]:
+                SESSION_L1_LOOKUPS.inc(result="miss")
+                return None
+            SESSION_L1_LOOKUPS.inc(result="hit")
+            return dict(entry[1])
+
+    def get_fields(self, key, fields):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None or not (entry[2] or all(field in entry[1] for field in fields)):
+                SESSION_L1_LOOKUPS.inc(result="miss")
+                return None
+            SESSION_L1_LOOKUPS.inc(result="hit")
+            return {field: entry[1][field] for field in fields if field in entry[1]}
+
+    def contains(self, key):
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def invalidate(self, key, publish=True):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._last_seq = next(self._seq)
+            self._invalidated[key] = self._last_seq
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.max_tracked_invalidations:
+                _, seq = self._invalidated.popitem(last=False)
+                self._invalidated_floor = max(self._invalidated_floor, seq)
+        SESSION_L1_INVALIDATIONS.inc(source="local" if publish else "channel")
+        if publish:
+            get_redis().publish(INVALIDATION_CHANNEL, key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            # Anything being fetched right now may predate a missed invalidation
+            self._last_seq = next(self._seq)
+            self._invalidated_floor = self._last_seq
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, name="session-l1-invalidation", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub()
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Wait for the subscription to be confirmed before trusting the cache
+                while pubsub.get_message(timeout=1.0) is None:
+                    pass
+                self.clear()
+                self._connected = True
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        self.invalidate(message["data"], publish=False)
+            except redis.exceptions.RedisError as e:
+                if self._connected:
+                    print(f"[SessionL1Cache] Invalidation channel lost, bypassing the cache: {e}")
+                self._connected = False
+                self.clear()
+                time.sleep(settings.REDIS_RETRY_SECONDS)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except redis.exceptions.RedisError:
+                        pass
+
+    def _reset_after_fork(self):
+        # The parent's listener thread doesn't exist in the child
+        self._lock = threading.Lock()
+        self._listener = None
+        self._connected = False
+        self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl,
+                    "connected": self._connected}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_session_l1_cache():
+    """Process-wide L1 cache, None when SESSION_L1_CACHE_ENABLED is off"""
+    global _cache
+    if not settings.SESSION_L1_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SessionL1Cache(settings.SESSION_L1_CACHE_MAX_ENTRIES, settings.SESSION_L1_CACHE_TTL_SECONDS)
+                if hasattr(os, "register_at_fork"):
+                    os.register_at_fork(after_in_child=_cache._reset_after_fork)
+    return _cache
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+
+from utils.metrics import FALLBACK_STORE_REMOVALS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    key TEXT PRIMARY KEY,
+    expire_at REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expire_at ON sessions (expire_at);
+"""
+
+
+class SQLiteStore:
+    """
+    Same interface as MemoryStore, but kept in a SQLite database in WAL mode so
+    every gunicorn and Celery worker on the host sees the same sessions while
+    Redis is down. Each thread of each process opens its own connection.
+    Expired rows are deleted by a background sweeper; beyond max_bytes the rows
+    closest to expiry (the least recently written) go first.
+    """
+
+    def __init__(self, path: str, max_bytes: int, sweep_interval: float, busy_timeout: float = 5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited through fork must not be used by the child
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str):
+        row = self._connect().execute(
+            "SELECT payload FROM sessions WHERE key = ? AND expire_at > ?", (key, time.time())
+        ).fetchone()
+        with self._lock:
+            self._stats["hits" if row else "misses"] += 1
+        return bytes(row[0]) if row else None
+
+    def set(self, key: str, payload: bytes, ttl_seconds: float):
+        self._connect().execute(
+            "INSERT INTO sessions (key, expire_at, payload) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET expire_at = excluded.expire_at, payload = excluded.payload",
+            (key, time.time() + ttl_seconds, sqlite3.Binary(payload))
+        )
+        if self._sweeper is None:
+            self._start_sweeper()
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def __contains__(self, key):
+        return self._connect().execute(
+            "SELECT 1 FROM sessions WHERE key = ? AND expire_at > ?", (key, time.time())
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _count(self, reason, amount):
+        if amount:
+            with self._lock:
+                self._stats[reason] += amount
+            FALLBACK_STORE_REMOVALS.inc(amount, reason=reason)
+
+    def sweep(self):
+        """Delete expired rows, then the rows closest to expiry while over max_bytes"""
+        conn = self._connect()
+        expired = conn.execute("DELETE FROM sessions WHERE expire_at <= ?", (time.time(),)).rowcount
+        self._count("expired", expired)
+
+        evicted = 0
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM sessions").fetchone()[0]
+        if total > self.max_bytes:
+            rows = conn.execute("SELECT key, LENGTH(payload) FROM sessions ORDER BY expire_at").fetchall()
+            doomed = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM sessions WHERE key = ?", doomed)
+            evicted = len(doomed)
+            self._count("evicted", evicted)
+
+        if expired or evicted:
+            print(f"[SQLiteStore] Removed {expired} expired and {evicted} evicted sessions.")
+        return expired + evicted
+
+    def _start_sweeper(self):
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="sqlite-store-sweep", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except sqlite3.Error as e:
+                print(f"[SQLiteStore] Error during sweep: {str(e)}")
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._local = threading.local()
+
+    def stats(self):
+        conn = self._connect()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM sessions").fetchone()
+        with self._lock:
+            return {**self._stats, "entries": entries, "bytes": size, "max_bytes": self.max_bytes,
+                    "path": self.path}
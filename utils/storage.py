@@ -1,45 +1,299 @@
-import json
-from app_config import settings
+import os
+import sqlite3
+import threading
 import time
+
 import redis
+from redis.client import NEVER_DECODE
+
+from app_config import settings
+from utils.codec import get_codec
+from utils.memory_store import MemoryStore
+from utils.sqlite_store import SQLiteStore
+from utils.redis_client import get_redis, redis_available, mark_redis_down
+from utils.session_cache import get_session_l1_cache
 
 
-class EvaluationStore:
-    def __init__(self, ttl_seconds: int = 24 * 3600):
-        self.ttl = ttl_seconds
-        self._use_redis = False
+def _create_fallback():
+    if settings.FALLBACK_STORE_BACKEND == "memory":
+        return MemoryStore(settings.FALLBACK_STORE_MAX_BYTES, settings.FALLBACK_STORE_SWEEP_INTERVAL_SECONDS)
+    path = settings.FALLBACK_STORE_PATH or os.path.join(
+        os.path.dirname(os.path.abspath(settings.UPLOAD_FOLDER)), "session_store", "sessions.sqlite3")
+    store = SQLiteStore(path, settings.FALLBACK_STORE_MAX_BYTES, settings.FALLBACK_STORE_SWEEP_INTERVAL_SECONDS)
+    try:
+        store._connect()
+    except (sqlite3.Error, OSError) as e:
+        print(f"[EvaluationStore] Can't open {path} ({str(e)}), falling back to memory")
+        return MemoryStore(settings.FALLBACK_STORE_MAX_BYTES, settings.FALLBACK_STORE_SWEEP_INTERVAL_SECONDS)
+    return store
+
+
+class FallbackStore:
+    """
+    Where sessions go while Redis is down, opened by the first outage so a
+    healthy Redis never touches it. Until everything written to it has moved
+    to Redis or expired it stays active and is checked on Redis misses.
+    """
+
+    def __init__(self):
+        self._store = None
+        self._active = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        """The backing store while active, else None"""
+        return self._store if self._active else None
+
+    def open(self):
+        with self._lock:
+            if self._store is None:
+                self._store = _create_fallback()
+            self._active = True
+        return self._store
+
+    def discard(self, key):
+        """Drop a key that now lives in Redis; never raises"""
+        store = self.store
+        if store is None:
+            return
         try:
-            r = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True)
-            r.ping()
-            self.r = r
-            self._use_redis = True
-        except redis.exceptions.ConnectionError:
-            self._mem = {}
-
-    def set(self, key: str, value: dict):
-        payload = json.dumps(value)
+            store.delete(key)
+            now = time.monotonic()
+            if now - self._checked_at >= settings.FALLBACK_STORE_SWEEP_INTERVAL_SECONDS:
+                self._checked_at = now
+                if len(store) == 0:
+                    self._active = False
+        except (sqlite3.Error, OSError) as e:
+            print(f"[EvaluationStore] Failed to clean {key} from the fallback store: {str(e)}")
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        if self._store is not None:
+            self._store._reset_after_fork()
+
+
+# Shared by every EvaluationStore in the process (and with "sqlite" by every process
+# on the host), so sessions written by one manager are visible to the others when Redis is down
+_fallback = FallbackStore()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_fallback._reset_after_fork)
+
+
+class EvaluationStore:
+    """
+    Session data in Redis through the shared pool. While Redis is down it is kept
+    in the FallbackStore (FALLBACK_STORE_BACKEND), which is still read after Redis
+    comes back so sessions started during the outage don't disappear.
+
+    With use_hashes (EVALUATION_STORE_HASHES) every top-level field is its own
+    JSON-encoded field of a Redis hash, so get_fields and update only move the
+    fields they name instead of the whole record.
+
+    Values (whole records, or single fields in hash mode) go through codec, see
+    utils/codec.py; they are read back as raw bytes so compressed values survive
+    the shared client's decode_responses.
+
+    With SESSION_L1_CACHE_ENABLED, values read from Redis are kept briefly in a
+    per-process SessionL1Cache that every write invalidates across processes.
+    Callers may change the top-level keys of what they get, not nested values.
+    """
+
+    def __init__(self, ttl_seconds: int = None, use_hashes: bool = None, codec=None):
+        self.ttl = settings.EVALUATION_STORE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.use_hashes = settings.EVALUATION_STORE_HASHES if use_hashes is None else use_hashes
+        self.codec = codec or get_codec()
+        self.r = get_redis()
+        self._fallback = _fallback
+        self.l1 = get_session_l1_cache()
+
+    @property
+    def _use_redis(self):
+        return redis_available()
+
+    def _active_l1(self):
+        return self.l1 if self.l1 is not None and self.l1.active else None
+
+    def _invalidate(self, key):
+        """After every write to Redis, so no process keeps serving the old value"""
+        if self.l1 is not None:
+            self.l1.invalidate(key)
+
+    def set(self, key: str, value: dict, ttl_seconds: int = None):
+        """Replace the whole record, kept for ttl_seconds (the store's TTL by default)"""
+        ttl = ttl_seconds or self.ttl
         if self._use_redis:
-            self.r.setex(key, self.ttl, payload)
-        else:
-            expire_at = time.time() + self.ttl
-            self._mem[key] = (expire_at, payload)
+            try:
+                if self.use_hashes:
+                    pipe = self.r.pipeline()
+                    pipe.delete(key)
+                    pipe.hset(key, mapping=self._encode_fields(value))
+                    pipe.expire(key, ttl)
+                    pipe.execute()
+                else:
+                    self.r.setex(key, ttl, self.codec.encode(value))
+                self._invalidate(key)
+                self._fallback.discard(key)
+                return
+            except redis.exceptions.RedisError as e:
+                mark_redis_down(e, "EvaluationStore")
+        self._set_fallback(key, value, ttl)
 
     def get(self, key: str):
         if self._use_redis:
-            raw = self.r.get(key)
-            return json.loads(raw) if raw else None
-        else:
-            item = self._mem.get(key)
-            if not item:
-                return None
-            expire_at, payload = item
-            if time.time() > expire_at:
-                del self._mem[key]
-                return None
-            return json.loads(payload)
+            l1 = self._active_l1()
+            if l1 is not None:
+                cached = l1.get(key)
+                if cached is not None:
+                    return cached
+                token = l1.begin_fill()
+            try:
+                value = self._get_hash(key) if self.use_hashes else self._get_blob(key)
+                if value is not None:
+                    if l1 is not None:
+                        l1.fill(key, value, True, token)
+                    return value
+            except redis.exceptions.RedisError as e:
+                mark_redis_down(e, "EvaluationStore")
+        return self._get_fallback(key)
+
+    def get_fields(self, key: str, fields):
+        """Only the named top-level fields that are set; None when the record doesn't exist"""
+        fields = list(fields)
+        if self._use_redis and self.use_hashes:
+            l1 = self._active_l1()
+            if l1 is not None:
+                cached = l1.get_fields(key, fields)
+                if cached is not None:
+                    return cached
+                token = l1.begin_fill()
+            try:
+                values = self.r.execute_command("HMGET", key, *fields, **{NEVER_DECODE: True})
+                if any(raw is not None for raw in values):
+                    result = {field: self.codec.decode(raw) for field, raw in zip(fields, values) if raw is not None}
+                    if l1 is not None:
+                        l1.fill(key, result, False, token)
+                    return result
+                if self.r.exists(key):
+                    return {}
+            except redis.exceptions.ResponseError:
+                # Written as a JSON blob before hashes were enabled
+                return self._pick(self._get_blob(key), fields)
+            except redis.exceptions.RedisError as e:
+                mark_redis_down(e, "EvaluationStore")
+            return self._pick(self._get_fallback(key), fields)
+        return self._pick(self.get(key), fields)
+
+    def get_or_load(self, key: str, fields, loader, ttl_seconds: int):
+        """
+        get_fields(), but on a miss the record is rebuilt with loader(key) and
+        cached for ttl_seconds. None when the loader has nothing either.
+        """
+        data = self.get_fields(key, fields)
+        if data is not None:
+            return data
+        value = loader(key)
+        if not value:
+            return None
+        self.set(key, value, ttl_seconds=ttl_seconds)
+        return self._pick(value, fields)
+
+    def update(self, key: str, fields: dict):
+        """Set some top-level fields of a record, creating it if needed, and restart its TTL"""
+        if self._use_redis and self.use_hashes:
+            try:
+                if self._get_fallback(key) is not None:
+                    # Started during an outage, move it to Redis with the update applied
+                    self.set(key, {**(self._get_fallback(key) or {}), **fields})
+                    return
+                pipe = self.r.pipeline()
+                pipe.hset(key, mapping=self._encode_fields(fields))
+                pipe.expire(key, self.ttl)
+                pipe.execute()
+                self._invalidate(key)
+                return
+            except redis.exceptions.ResponseError:
+                self._upgrade_blob(key, fields)
+                return
+            except redis.exceptions.RedisError as e:
+                mark_redis_down(e, "EvaluationStore")
+        self.set(key, {**(self.get(key) or {}), **fields})
+
+    def exists(self, key: str) -> bool:
+        if self._use_redis:
+            l1 = self._active_l1()
+            if l1 is not None and l1.contains(key):
+                return True
+            try:
+                if self.r.exists(key):
+                    return True
+            except redis.exceptions.RedisError as e:
+                mark_redis_down(e, "EvaluationStore")
+        return self._get_fallback(key) is not None
 
     def delete(self, key: str):
         if self._use_redis:
-            self.r.delete(key)
-        else:
-            self._mem.pop(key, None)
+            try:
+                self.r.delete(key)
+                self._invalidate(key)
+                self._fallback.discard(key)
+                return
+            except redis.exceptions.RedisError as e:
+                mark_redis_down(e, "EvaluationStore")
+        self._fallback.open().delete(key)
+
+    def _encode_fields(self, value):
+        # HSET rejects an empty mapping, an empty record keeps one placeholder field
+        return {field: self.codec.encode(item) for field, item in value.items()} or {"_": "null"}
+
+    # Records written before EVALUATION_STORE_HASHES was switched stay readable
+    # in either mode: a WRONGTYPE reply means the other layout
+    def _get_hash(self, key):
+        try:
+            return self._decode_hash(self._read("HGETALL", key))
+        except redis.exceptions.ResponseError:
+            return self._decode_blob(self._read("GET", key))
+
+    def _get_blob(self, key):
+        try:
+            return self._decode_blob(self._read("GET", key))
+        except redis.exceptions.ResponseError:
+            return self._decode_hash(self._read("HGETALL", key))
+
+    def _read(self, command, key):
+        return self.r.execute_command(command, key, **{NEVER_DECODE: True})
+
+    def _decode_hash(self, raw):
+        if not raw:
+            return None
+        return {field.decode("utf-8"): self.codec.decode(item) for field, item in raw.items() if field != b"_"}
+
+    def _decode_blob(self, raw):
+        return self.codec.decode(raw) if raw else None
+
+    def _upgrade_blob(self, key, fields):
+        """Rewrite a record stored as a JSON blob as a hash"""
+        self.set(key, {**(self._get_blob(key) or {}), **fields})
+
+    @staticmethod
+    def _pick(value, fields):
+        if value is None:
+            return None
+        return {field: value[field] for field in fields if field in value}
+
+    def _set_fallback(self, key, value, ttl):
+        self._fallback.open().set(key, self.codec.encode(value), ttl)
+
+    def _get_fallback(self, key):
+        # With Redis up only an outage seen earlier can have left the key there
+        store = self._fallback.store if self._use_redis else self._fallback.open()
+        if store is None:
+            return None
+        try:
+            payload = store.get(key)
+        except (sqlite3.Error, OSError) as e:
+            print(f"[EvaluationStore] Failed to read {key} from the fallback store: {str(e)}")
+            return None
+        return self.codec.decode(payload) if payload is not None else None